@@ -1,6 +1,9 @@
 from flask import Flask
 from .config import Configuration
 from .extensions import api as smorest_api
+from .conditional import init_conditional
+from .metrics import init_metrics
+from .profiling import init_profiling
 
 def create_app():
     app = Flask(__name__)
@@ -12,9 +15,26 @@ def create_app():
     # Register blueprints
     from .api.spotify_api import blp as SpotifyBlueprint
     from .api.users import blp as UsersBlueprint
+    from .api.users import bulk_blp as UsersBulkBlueprint
 
     smorest_api.register_blueprint(SpotifyBlueprint)
     smorest_api.register_blueprint(UsersBlueprint)
+    smorest_api.register_blueprint(UsersBulkBlueprint)
+
+    # Metricas Prometheus (/metrics) y tiempos por ruta
+    init_metrics(app)
+
+    # Cabeceras de respuestas servidas desde cache caducada (Spotify no disponible)
+    init_conditional(app)
+
+    # Perfilado opcional de una muestra de peticiones (o con cabecera X-Profile)
+    init_profiling(app)
+
+    # Precalentado opcional de la cache con los favoritos de los usuarios
+    if app.config.get("CACHE_WARMER_ENABLED"):
+        from .services.cache_warmer import start_cache_warmer
+
+        start_cache_warmer(app)
 
     @app.route("/")
     def index():
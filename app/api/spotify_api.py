@@ -1,14 +1,33 @@
+import math
+
+from flask import current_app
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from ..services.spotify_service import SpotifyService
+
+from ..conditional import cache_headers, is_not_modified, not_modified, representation_etag
+from ..models import ALBUM_FIELDS, ARTIST_FIELDS, Track, pick_fields, to_dicts
+from ..serialization import fast_response
+from ..services.circuit_breaker import CircuitOpen
+from ..services.rate_limiter import UpstreamThrottled
+from ..services.spotify_service import SpotifyService, is_upstream_failure
 from ..schemas.spotify_schemas import (
     SearchQuerySchema,
     SearchResultSchema,
     AlbumSchema,
     ArtistSchema,
     FullTrackSchema,
+    TrackQuerySchema,
+    AlbumQuerySchema,
+    ArtistQuerySchema,
 )
 
+# Campos de cada item de /v1/search segun `type`
+SEARCH_ITEM_FIELDS = {
+    "track": Track.SUMMARY_FIELDS,
+    "album": ALBUM_FIELDS,
+    "artist": ARTIST_FIELDS,
+}
+
 blp = Blueprint(
     "spotify",
     "spotify",
@@ -17,58 +36,41 @@ blp = Blueprint(
 )
 
 
-def _map_tracks(tracks):
-    filtered = []
-    for t in tracks:
-        artist_names = " ".join(a.get("name", "") for a in t.get("artists", []))
-        track_name = t.get("name", "")
-        album_name = t.get("album", {}).get("name", "")
-        filtered.append(
-            {
-                "id": t.get("id"),
-                "name": track_name,
-                "artists": [a.get("name", "") for a in t.get("artists", [])],
-                "album": album_name,
-                "preview_url": t.get("preview_url"),
-                "external_url": t.get("external_urls", {}).get("spotify"),
-            }
-        )
-    return filtered
-
-
-def _map_albums(albums):
-    filtered = []
-    for a in albums:
-        artist_names = " ".join(ar.get("name", "") for ar in a.get("artists", []))
-        album_name = a.get("name", "")
-        filtered.append(
-            {
-                "id": a.get("id"),
-                "name": album_name,
-                "artists": [ar.get("name", "") for ar in a.get("artists", [])],
-                "release_date": a.get("release_date"),
-                "total_tracks": a.get("total_tracks"),
-                "external_url": a.get("external_urls", {}).get("spotify"),
-            }
-        )
-    return filtered
-
-
-def _map_artists(artists):
-    filtered = []
-    for a in artists:
-        name = a.get("name", "")
-        genres = " ".join(a.get("genres", []))
-        filtered.append(
-            {
-                "id": a.get("id"),
-                "name": name,
-                "genres": a.get("genres", []),
-                "followers": a.get("followers", {}).get("total"),
-                "external_url": a.get("external_urls", {}).get("spotify"),
-            }
-        )
-    return filtered
+def _abort_throttled(e):
+    """
+    Spotify nos limita o su disyuntor esta abierto: 503 con Retry-After en
+    lugar de un 500 generico.
+    """
+    abort(503, message=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+
+def _entity_response(kind, entity_id, fields):
+    """
+    Detalle de una entidad con ETag (hash de contenido guardado en la cache)
+    y Cache-Control segun su tipo. Si el cliente ya tiene la version cacheada
+    se responde 304 sin llamar a Spotify ni serializar.
+    """
+    service = SpotifyService()
+    max_age = current_app.config.get(f"HTTP_MAX_AGE_{kind.upper()}", 0)
+    cached = service.cache.fresh_etag(kind, entity_id)
+    if cached is not None:
+        etag = representation_etag(cached)
+        if is_not_modified(etag):
+            return not_modified(etag, max_age)
+
+    entity = getattr(service, f"get_{kind}")(entity_id)
+    etag = representation_etag(service.cache.etag_for(kind, entity_id, entity))
+    if is_not_modified(etag):
+        return not_modified(etag, max_age)
+    return fast_response(entity.to_dict(fields), headers=cache_headers(etag, max_age))
+
+
+def _search_response(type_, entities, fields, source):
+    items = to_dicts(entities, pick_fields(SEARCH_ITEM_FIELDS[type_], fields))
+    return fast_response(
+        {"type": type_, "count": len(items), "items": items},
+        headers={"X-Search-Source": source},
+    )
 
 
 @blp.route("/search")
@@ -76,33 +78,54 @@ class SearchResource(MethodView):
     """
     Replica: GET https://api.spotify.com/v1/search
     Soporta track, album y artist; respeta el esquema de Spotify.
+    `fields` limita los campos de cada item.
     """
 
     @blp.arguments(SearchQuerySchema, location="query")
-    @blp.response(200, SearchResultSchema)
+    @blp.response(
+        200,
+        SearchResultSchema,
+        headers={
+            "X-Search-Source": {
+                "description": "Origen de los resultados: upstream (Spotify) o local (indice de lo cacheado)",
+                "schema": {"type": "string"},
+            }
+        },
+    )
     def get(self, args):
+        """
+        Con `source=local` se responde solo desde el indice local de lo ya
+        cacheado; con `source=auto` (por defecto) tambien, pero solo si
+        Spotify falla o nos limita y el indice tiene resultados.
+        """
         q = args["q"]
         type_ = args.get("type", "track")
         limit = args.get("limit", 10)
         market = args.get("market", "ES")
+        source = args["source"]
+        fields = args.get("fields_")
 
         if type_ not in {"track", "album", "artist"}:
             abort(400, message="Solo se soportan type=track, album o artist en esta API.")
 
-        try:
-            service = SpotifyService()
-            data = service.search(q=q, type_=type_, limit=limit, market=market)
-
-            if type_ == "track":
-                items = _map_tracks(data.get("tracks", {}).get("items", []))
-            elif type_ == "album":
-                items = _map_albums(data.get("albums", {}).get("items", []))
-            else:
-                items = _map_artists(data.get("artists", {}).get("items", []))
+        service = SpotifyService()
+        if source == "local":
+            if service.search_index is None:
+                abort(400, message="La busqueda local esta desactivada (SEARCH_INDEX_ENABLED).")
+            return _search_response(type_, service.search_local(q, type_, limit), fields, "local")
 
-            return {"type": type_, "count": len(items), "items": items}
+        try:
+            entities = service.search(q=q, type_=type_, limit=limit, market=market)
         except Exception as e:
+            # Solo si Spotify no esta disponible: un 4xx o un error nuestro no se tapan
+            local = service.search_local(q, type_, limit) if source == "auto" and is_upstream_failure(e) else []
+            if local:
+                service.served_stale = True
+                return _search_response(type_, local, fields, "local")
+            if isinstance(e, (UpstreamThrottled, CircuitOpen)):
+                _abort_throttled(e)
             abort(500, message=str(e))
+        return _search_response(type_, entities, fields, "upstream")
 
 
 @blp.route("/tracks/<string:track_id>")
@@ -111,23 +134,14 @@ class TrackResource(MethodView):
     Replica: GET https://api.spotify.com/v1/tracks/{id}
     """
 
+    @blp.arguments(TrackQuerySchema, location="query")
     @blp.response(200, FullTrackSchema)
-    def get(self, track_id):
+    @blp.alt_response(304, description="Sin cambios respecto al ETag de If-None-Match")
+    def get(self, args, track_id):
         try:
-            service = SpotifyService()
-            t = service.get_track(track_id)
-
-            result = {
-                "id": t.get("id"),
-                "name": t.get("name"),
-                "artists": [a.get("name", "") for a in t.get("artists", [])],
-                "album": t.get("album", {}).get("name", ""),
-                "duration_ms": t.get("duration_ms"),
-                "preview_url": t.get("preview_url"),
-                "external_url": t.get("external_urls", {}).get("spotify"),
-            }
-
-            return result
+            return _entity_response("track", track_id, args.get("fields_"))
+        except (UpstreamThrottled, CircuitOpen) as e:
+            _abort_throttled(e)
         except Exception as e:
             abort(500, message=str(e))
 
@@ -138,19 +152,14 @@ class AlbumResource(MethodView):
     Replica: GET https://api.spotify.com/v1/albums/{id}
     """
 
+    @blp.arguments(AlbumQuerySchema, location="query")
     @blp.response(200, AlbumSchema)
-    def get(self, album_id):
+    @blp.alt_response(304, description="Sin cambios respecto al ETag de If-None-Match")
+    def get(self, args, album_id):
         try:
-            service = SpotifyService()
-            a = service.get_album(album_id)
-            return {
-                "id": a.get("id"),
-                "name": a.get("name"),
-                "artists": [ar.get("name", "") for ar in a.get("artists", [])],
-                "release_date": a.get("release_date"),
-                "total_tracks": a.get("total_tracks"),
-                "external_url": a.get("external_urls", {}).get("spotify"),
-            }
+            return _entity_response("album", album_id, args.get("fields_"))
+        except (UpstreamThrottled, CircuitOpen) as e:
+            _abort_throttled(e)
         except Exception as e:
             abort(500, message=str(e))
 
@@ -161,17 +170,13 @@ class ArtistResource(MethodView):
     Replica: GET https://api.spotify.com/v1/artists/{id}
     """
 
+    @blp.arguments(ArtistQuerySchema, location="query")
     @blp.response(200, ArtistSchema)
-    def get(self, artist_id):
+    @blp.alt_response(304, description="Sin cambios respecto al ETag de If-None-Match")
+    def get(self, args, artist_id):
         try:
-            service = SpotifyService()
-            a = service.get_artist(artist_id)
-            return {
-                "id": a.get("id"),
-                "name": a.get("name"),
-                "genres": a.get("genres", []),
-                "followers": a.get("followers", {}).get("total"),
-                "external_url": a.get("external_urls", {}).get("spotify"),
-            }
+            return _entity_response("artist", artist_id, args.get("fields_"))
+        except (UpstreamThrottled, CircuitOpen) as e:
+            _abort_throttled(e)
         except Exception as e:
             abort(500, message=str(e))
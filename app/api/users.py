@@ -1,13 +1,37 @@
+import base64
+import binascii
+import io
+import json
+from itertools import islice
+from urllib.parse import urlencode
+
+from flask import Response, current_app, request, stream_with_context
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
+from marshmallow import ValidationError
 from ..schemas.user_schemas import (
     UserSchema,
     UserCreateSchema,
     UserUpdateSchema,
+    UserListQuerySchema,
+    UserQuerySchema,
+    UserBulkResultSchema,
+    AudienceQuerySchema,
+    AudienceSchema,
+    SimilarQuerySchema,
+    SimilarUsersSchema,
+    USER_FIELDS,
 )
-from ..schemas.spotify_schemas import FavoritesDetailSchema
+from ..conditional import cache_headers, is_not_modified, not_modified, representation_etag
+from ..models import ARTIST_FIELDS, Track, pick_fields, to_dicts
+from ..schemas.spotify_schemas import FavoritesDetailSchema, FavoritesQuerySchema
+from ..serialization import dumps, fast_enabled, fast_response
+from ..services.circuit_breaker import CircuitOpen
+from ..services.rate_limiter import UpstreamThrottled
 from ..services.spotify_service import SpotifyService
 from ..repositories import user_repository as repo
+from ..repositories.errors import UserConflictError
+from .spotify_api import _abort_throttled
 
 blp = Blueprint(
     "users",
@@ -16,17 +40,128 @@ blp = Blueprint(
     description="Gestión de usuarios (almacenados en JSON)"
 )
 
+# Operaciones masivas: /v1/users:bulk y /v1/users:export (fuera de /v1/users/<id>)
+bulk_blp = Blueprint(
+    "users_bulk",
+    "users_bulk",
+    url_prefix="/v1",
+    description="Importación y exportación masiva de usuarios (NDJSON)"
+)
+
+
+def _encode_cursor(user_id):
+    return base64.urlsafe_b64encode(user_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        abort(400, message="Cursor 'after' no valido")
+
+
+def _project(user, fields):
+    """
+    Poda el usuario a los campos pedidos en `fields` (los de UserSchema si es
+    None): sin esquema, las claves extra del almacenamiento no llegan al cliente.
+    """
+    return {name: user[name] for name in (USER_FIELDS if fields is None else fields) if name in user}
+
+
+def _user_etag():
+    """
+    ETag de las respuestas de usuarios a partir de la version del repositorio.
+    Se lee antes que los datos: si hay una escritura entre medias, el ETag
+    queda viejo (otro 200 la proxima vez) y nunca provoca un 304 indebido.
+    """
+    return representation_etag(f"u{repo.data_version()}")
+
+
+def _user_max_age():
+    return current_app.config.get("HTTP_MAX_AGE_USER", 0)
+
+
+def _stream_users(mode, after, limit, fields=None):
+    """Respuesta en streaming: cada usuario se serializa y se envia por separado."""
+    if after is not None and repo.get_user_by_id(after) is None:
+        abort(400, message="Cursor 'after' no valido")
+    users = repo.iter_users(after)
+    if limit is not None:
+        users = islice(users, limit)
+    schema = None if fast_enabled() else UserSchema()
+
+    def encode(user):
+        user = _project(user, fields)
+        if schema is None:
+            return dumps(user).decode("utf-8")
+        return json.dumps(schema.dump(user), ensure_ascii=False)
+
+    def ndjson():
+        for user in users:
+            yield encode(user) + "\n"
+
+    def array():
+        yield "["
+        for i, user in enumerate(users):
+            yield ("," if i else "") + encode(user)
+        yield "]"
+
+    if mode == "ndjson":
+        return Response(stream_with_context(ndjson()), mimetype="application/x-ndjson")
+    return Response(stream_with_context(array()), mimetype="application/json")
+
 
 @blp.route("")
 class UserListResource(MethodView):
 
-    @blp.response(200, UserSchema(many=True))
-    def get(self):
+    @blp.arguments(UserListQuerySchema, location="query")
+    @blp.response(
+        200,
+        UserSchema(many=True),
+        headers={
+            "X-Next-Cursor": {
+                "description": "Cursor para la siguiente pagina (solo con limit)",
+                "schema": {"type": "string"},
+            }
+        },
+    )
+    @blp.alt_response(304, description="Sin cambios respecto al ETag de If-None-Match")
+    def get(self, args):
         """
-        Listar todos los usuarios.
+        Listar usuarios.
+
+        Con `limit` se pagina por cursor (`after`); con `stream` la respuesta
+        se genera usuario a usuario (NDJSON o array JSON) sin cargar la lista.
+        `fields` limita los campos de cada usuario.
         """
-        users = repo.get_all_users()
-        return users
+        limit = args.get("limit")
+        fields = args.get("fields_")
+        after = _decode_cursor(args["after"]) if "after" in args else None
+
+        if args.get("stream"):
+            return _stream_users(args["stream"], after, limit, fields)
+
+        etag = _user_etag()
+        if is_not_modified(etag):
+            return not_modified(etag, _user_max_age(), private=True)
+        headers = cache_headers(etag, _user_max_age(), private=True)
+
+        if limit is None and after is None:
+            return fast_response([_project(user, fields) for user in repo.get_all_users()], headers=headers)
+
+        try:
+            users, next_id = repo.get_users_page(limit or 1000, after)
+        except KeyError:
+            abort(400, message="Cursor 'after' no valido")
+        if next_id is not None:
+            cursor = _encode_cursor(next_id)
+            headers["X-Next-Cursor"] = cursor
+            # Se conservan los demas parametros (fields, ...); solo cambia el cursor
+            query = request.args.to_dict(flat=False)
+            query.update(limit=[str(limit or 1000)], after=[cursor])
+            headers["Link"] = f'<{request.base_url}?{urlencode(query, doseq=True)}>; rel="next"'
+        return fast_response([_project(user, fields) for user in users], headers=headers)
 
     @blp.arguments(UserCreateSchema)
     @blp.response(201, UserSchema)
@@ -34,22 +169,31 @@ class UserListResource(MethodView):
         """
         Crear un usuario nuevo.
         """
-        user = repo.create_user(new_data)
+        try:
+            user = repo.create_user(new_data)
+        except UserConflictError as e:
+            abort(409, message=str(e))
         return user
 
 
 @blp.route("/<string:user_id>")
 class UserResource(MethodView):
 
+    @blp.arguments(UserQuerySchema, location="query")
     @blp.response(200, UserSchema)
-    def get(self, user_id):
+    @blp.alt_response(304, description="Sin cambios respecto al ETag de If-None-Match")
+    def get(self, args, user_id):
         """
         Obtener un usuario por ID.
         """
+        etag = _user_etag()
         user = repo.get_user_by_id(user_id)
         if not user:
             abort(404, message="Usuario no encontrado")
-        return user
+        if is_not_modified(etag):
+            return not_modified(etag, _user_max_age(), private=True)
+        headers = cache_headers(etag, _user_max_age(), private=True)
+        return fast_response(_project(user, args.get("fields_")), headers=headers)
 
     @blp.arguments(UserUpdateSchema)
     @blp.response(200, UserSchema)
@@ -57,7 +201,10 @@ class UserResource(MethodView):
         """
         Actualizar un usuario (parcial).
         """
-        user = repo.update_user(user_id, updates)
+        try:
+            user = repo.update_user(user_id, updates)
+        except UserConflictError as e:
+            abort(409, message=str(e))
         if not user:
             abort(404, message="Usuario no encontrado")
         return user
@@ -74,43 +221,165 @@ class UserResource(MethodView):
         return ""
 
 
+@blp.route("/favorites/<any(tracks, artists):kind>/<string:item_id>")
+class FavoriteAudienceResource(MethodView):
+
+    @blp.arguments(AudienceQuerySchema, location="query")
+    @blp.response(200, AudienceSchema)
+    @blp.alt_response(304, description="Sin cambios respecto al ETag de If-None-Match")
+    def get(self, args, kind, item_id):
+        """
+        Usuarios que tienen un track o artista entre sus favoritos.
+
+        Se responde desde el indice invertido de favoritos, sin recorrer los
+        usuarios.
+        """
+        etag = _user_etag()
+        if is_not_modified(etag):
+            return not_modified(etag, _user_max_age(), private=True)
+        count, user_ids = repo.get_users_with_favorite(kind, item_id, args["limit"])
+        headers = cache_headers(etag, _user_max_age(), private=True)
+        return fast_response({"id": item_id, "count": count, "user_ids": user_ids}, headers=headers)
+
+
+@blp.route("/<string:user_id>/similar")
+class SimilarUsersResource(MethodView):
+
+    @blp.arguments(SimilarQuerySchema, location="query")
+    @blp.response(200, SimilarUsersSchema)
+    @blp.alt_response(304, description="Sin cambios respecto al ETag de If-None-Match")
+    def get(self, args, user_id):
+        """
+        Usuarios con gustos mas parecidos (top-k por Jaccard o coseno).
+
+        Solo se puntuan los usuarios que comparten algun favorito, a partir
+        del indice invertido.
+        """
+        etag = _user_etag()
+        if is_not_modified(etag):
+            return not_modified(etag, _user_max_age(), private=True)
+        kinds = ("tracks", "artists") if args["by"] == "all" else (args["by"],)
+        results = repo.get_similar_users(user_id, args["k"], args["metric"], kinds)
+        if results is None:
+            abort(404, message="Usuario no encontrado")
+        headers = cache_headers(etag, _user_max_age(), private=True)
+        return fast_response(
+            {"user_id": user_id, "metric": args["metric"], "by": args["by"], "results": results},
+            headers=headers,
+        )
+
+
 @blp.route("/<string:user_id>/favorites/details")
 class UserFavoritesDetailResource(MethodView):
     """
     Devuelve info detallada de canciones y artistas favoritos del usuario.
     """
 
+    @blp.arguments(FavoritesQuerySchema, location="query")
     @blp.response(200, FavoritesDetailSchema)
-    def get(self, user_id):
+    def get(self, args, user_id):
         user = repo.get_user_by_id(user_id)
         if not user:
             abort(404, message="Usuario no encontrado")
 
+        service = SpotifyService()
+        result = service.fanout.run(
+            {
+                "tracks": lambda: service.get_several_tracks(user.get("favorite_tracks", [])),
+                "artists": lambda: service.get_several_artists(user.get("favorite_artists", [])),
+            },
+            max_concurrency=service.fanout_concurrency,
+            timeout=current_app.config.get("SPOTIFY_FANOUT_DEADLINE"),
+        )
+        if not result.results:
+            # Si todo lo que fallo es saturacion de Spotify, 503 con el Retry-After mas largo
+            failures = list(result.exceptions.values())
+            if failures and all(isinstance(e, (UpstreamThrottled, CircuitOpen)) for e in failures):
+                _abort_throttled(max(failures, key=lambda e: e.retry_after))
+            abort(500, message="; ".join(result.errors.values()))
+
+        fields = args.get("fields_")
+        track_details = to_dicts(result.results.get("tracks", []), pick_fields(Track.SUMMARY_FIELDS, fields))
+        artist_details = to_dicts(result.results.get("artists", []), pick_fields(ARTIST_FIELDS, fields))
+
+        errors = [{"source": name, "message": message} for name, message in result.errors.items()]
+        errors.extend(service.partial_errors)
+        return fast_response({"tracks": track_details, "artists": artist_details, "errors": errors})
+
+
+def _read_bulk_lines(stream, max_lines):
+    """
+    Valida el NDJSON linea a linea con UserCreateSchema. Devuelve las lineas
+    validas [(numero, datos)] y los errores [{"line", "errors"}]; los emails
+    repetidos (en el lote o ya existentes) cuentan como error de su linea.
+    """
+    schema = UserCreateSchema()
+    valid, errors = [], []
+    emails = set()
+    for number, raw in enumerate(stream, start=1):
+        if number > max_lines:
+            abort(413, message=f"Como maximo {max_lines} lineas por peticion")
+        if not raw.strip():
+            continue
+        try:
+            data = schema.load(json.loads(raw))
+        except ValueError:
+            errors.append({"line": number, "errors": {"_schema": ["JSON no valido"]}})
+            continue
+        except ValidationError as e:
+            errors.append({"line": number, "errors": e.messages})
+            continue
+        if data["email"] in emails or repo.get_user_by_email(data["email"]) is not None:
+            errors.append({"line": number, "errors": {"email": ["Ya existe un usuario con ese email"]}})
+            continue
+        emails.add(data["email"])
+        valid.append((number, data))
+    return valid, errors
+
+
+@bulk_blp.route("/users:bulk")
+class UserBulkResource(MethodView):
+
+    @bulk_blp.doc(requestBody={
+        "required": True,
+        "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        "description": "Un usuario por linea, con los campos de POST /v1/users",
+    })
+    @bulk_blp.response(200, UserBulkResultSchema)
+    def post(self):
+        """
+        Alta masiva de usuarios (NDJSON).
+
+        Cada linea se valida por separado; las validas se guardan con una
+        sola escritura en el almacenamiento y las invalidas se devuelven en
+        `errors` con su numero de linea.
+        """
+        # request.stream no tiene buffer: leer lineas directamente iria byte a byte
+        stream = io.BufferedReader(request.stream, 64 * 1024)
+        valid, errors = _read_bulk_lines(stream, current_app.config.get("USERS_BULK_MAX_LINES", 100000))
+        if not valid:
+            # Nada que guardar: sin escritura, la version de los datos (y los ETag) no cambia
+            return {"created": [], "errors": errors}
         try:
-            service = SpotifyService()
-            track_details = []
-            for track_id in user.get("favorite_tracks", []):
-                t = service.get_track(track_id)
-                track_details.append({
-                    "id": t.get("id"),
-                    "name": t.get("name"),
-                    "artists": [a.get("name", "") for a in t.get("artists", [])],
-                    "album": t.get("album", {}).get("name", ""),
-                    "preview_url": t.get("preview_url"),
-                    "external_url": t.get("external_urls", {}).get("spotify"),
-                })
-
-            artist_details = []
-            for artist_id in user.get("favorite_artists", []):
-                a = service.get_artist(artist_id)
-                artist_details.append({
-                    "id": a.get("id"),
-                    "name": a.get("name"),
-                    "genres": a.get("genres", []),
-                    "followers": a.get("followers", {}).get("total"),
-                    "external_url": a.get("external_urls", {}).get("spotify"),
-                })
-
-            return {"tracks": track_details, "artists": artist_details}
-        except Exception as e:
-            abort(500, message=str(e))
+            users = repo.create_users([data for _, data in valid])
+        except UserConflictError as e:
+            abort(409, message=str(e))
+        created = [{"line": number, "id": user["id"]} for (number, _), user in zip(valid, users)]
+        return {"created": created, "errors": errors}
+
+
+@bulk_blp.route("/users:export")
+class UserExportResource(MethodView):
+
+    @bulk_blp.arguments(UserQuerySchema, location="query")
+    @bulk_blp.response(200, UserSchema(many=True), content_type="application/x-ndjson")
+    def get(self, args):
+        """
+        Exportar todos los usuarios en NDJSON.
+
+        Se recorren por lotes y se envian usuario a usuario, sin construir la
+        lista completa en memoria.
+        """
+        response = _stream_users("ndjson", None, None, args.get("fields_"))
+        response.headers["Content-Disposition"] = 'attachment; filename="users.ndjson"'
+        return response
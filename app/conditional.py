@@ -0,0 +1,57 @@
+"""
+Peticiones condicionales: ETag, If-None-Match (304) y Cache-Control.
+
+El ETag base lo da quien conoce la version del dato (hash de contenido de
+la cache de metadatos, version del repositorio de usuarios). Se le anade
+una huella de la representacion (query string y modo de serializacion),
+porque `fields`, `limit`... cambian el cuerpo de la respuesta.
+"""
+import zlib
+
+from flask import Response, g, request
+
+from .metrics import metrics
+from .serialization import fast_enabled
+
+# Cabeceras de una respuesta servida con datos caducados porque Spotify no respondia
+STALE_HEADERS = {"Warning": '110 - "Response is Stale"', "X-Cache-Stale": "1"}
+
+
+def representation_etag(base):
+    """ETag fuerte para la respuesta actual a partir de la version del dato."""
+    variant = zlib.crc32(request.query_string + (b"|fast" if fast_enabled() else b""))
+    return f"{base}-{variant:08x}"
+
+
+def cache_headers(etag, max_age, private=False):
+    scope = "private" if private else "public"
+    return {"ETag": f'"{etag}"', "Cache-Control": f"{scope}, max-age={max_age}"}
+
+
+def is_not_modified(etag):
+    """True si el cliente ya tiene esta representacion (If-None-Match)."""
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag, max_age, private=False):
+    """Respuesta 304 sin cuerpo (no se serializa nada)."""
+    return Response(status=304, headers=cache_headers(etag, max_age, private))
+
+
+def served_stale():
+    """True si algun SpotifyService de la peticion sirvio datos caducados."""
+    return any(service.served_stale for service in g.get("spotify_services", ()))
+
+
+def init_conditional(app):
+    """Marca como stale (y sin max-age) las respuestas degradadas por fallos upstream."""
+
+    @app.after_request
+    def _mark_stale(response):
+        if served_stale():
+            response.headers.update(STALE_HEADERS)
+            if "Cache-Control" in response.headers:
+                scope = response.headers["Cache-Control"].split(",")[0]
+                response.headers["Cache-Control"] = f"{scope}, max-age=0"
+            metrics.inc("http_stale_responses_total")
+        return response
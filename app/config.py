@@ -11,9 +11,102 @@ class Configuration:
     OPENAPI_SWAGGER_UI_PATH = "/docs"
     OPENAPI_SWAGGER_UI_URL = "https://cdn.jsdelivr.net/npm/swagger-ui-dist/"
 
+    # Metricas Prometheus en /metrics
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+    # Respuestas de lectura codificadas sin marshmallow (orjson si esta instalado)
+    FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "0") == "1"
+
+    # Cache-Control max-age (segundos) por tipo de entidad en respuestas con ETag
+    HTTP_MAX_AGE_TRACK = int(os.environ.get("HTTP_MAX_AGE_TRACK", "3600"))
+    HTTP_MAX_AGE_ALBUM = int(os.environ.get("HTTP_MAX_AGE_ALBUM", "3600"))
+    HTTP_MAX_AGE_ARTIST = int(os.environ.get("HTTP_MAX_AGE_ARTIST", "600"))
+    HTTP_MAX_AGE_USER = int(os.environ.get("HTTP_MAX_AGE_USER", "0"))  # private
+
     # Spotify variables
     SPOTIFY_CLIENT_ID = os.environ.get("SPOTIFY_CLIENT_ID","743c7a9e6a844954a03589528ac3d6b3")
     SPOTIFY_CLIENT_SECRET = os.environ.get("SPOTIFY_CLIENT_SECRET","bf01f5a01fda4d608d52007362fcce5f")
+    # URLs de Spotify (se pueden apuntar a un servidor local, p. ej. benchmarks/fake_spotify.py)
+    SPOTIFY_API_BASE_URL = os.environ.get("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1")
+    SPOTIFY_TOKEN_URL = os.environ.get("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+    # Segundos de antelacion con los que se refresca el token antes de caducar
+    SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.environ.get("SPOTIFY_TOKEN_REFRESH_MARGIN", "60"))
+
+    # Transporte HTTP hacia Spotify (pool keep-alive compartido, timeouts y reintentos)
+    SPOTIFY_HTTP_POOL_SIZE = int(os.environ.get("SPOTIFY_HTTP_POOL_SIZE", "20"))
+    SPOTIFY_HTTP_CONNECT_TIMEOUT = float(os.environ.get("SPOTIFY_HTTP_CONNECT_TIMEOUT", "3.05"))
+    SPOTIFY_HTTP_READ_TIMEOUT = float(os.environ.get("SPOTIFY_HTTP_READ_TIMEOUT", "10"))
+    SPOTIFY_HTTP_RETRIES = int(os.environ.get("SPOTIFY_HTTP_RETRIES", "2"))
+    SPOTIFY_HTTP_BACKOFF = float(os.environ.get("SPOTIFY_HTTP_BACKOFF", "0.2"))
+    SPOTIFY_HTTP_BACKOFF_JITTER = float(os.environ.get("SPOTIFY_HTTP_BACKOFF_JITTER", "0.1"))
+
+    # Cache en memoria de metadatos (TTL en segundos por tipo de entidad)
+    SPOTIFY_CACHE_MAX_ENTRIES = int(os.environ.get("SPOTIFY_CACHE_MAX_ENTRIES", "10000"))
+    SPOTIFY_CACHE_MAX_BYTES = int(os.environ.get("SPOTIFY_CACHE_MAX_BYTES", "0"))  # 0 = sin limite
+    SPOTIFY_CACHE_TTL_TRACK = int(os.environ.get("SPOTIFY_CACHE_TTL_TRACK", "86400"))
+    SPOTIFY_CACHE_TTL_ALBUM = int(os.environ.get("SPOTIFY_CACHE_TTL_ALBUM", "86400"))
+    SPOTIFY_CACHE_TTL_ARTIST = int(os.environ.get("SPOTIFY_CACHE_TTL_ARTIST", "3600"))
+    # Ventana en la que se sirve una entrada caducada mientras se refresca
+    SPOTIFY_CACHE_STALE_TTL = int(os.environ.get("SPOTIFY_CACHE_STALE_TTL", "86400"))
+
+    # Cache de metadatos en disco (SQLite) compartida por los workers y persistente
+    # entre reinicios; vacio = desactivada
+    SPOTIFY_DISK_CACHE_DIR = os.environ.get("SPOTIFY_DISK_CACHE_DIR", "")
+    SPOTIFY_DISK_CACHE_MAX_ENTRIES = int(os.environ.get("SPOTIFY_DISK_CACHE_MAX_ENTRIES", "200000"))
+
+    # Precalentado en segundo plano de los favoritos de todos los usuarios:
+    # pasada completa cada INTERVAL s, RATE lotes/s, refresco de lo que caduca en REFRESH_AHEAD s
+    CACHE_WARMER_ENABLED = os.environ.get("CACHE_WARMER_ENABLED", "0") == "1"
+    CACHE_WARMER_INTERVAL = float(os.environ.get("CACHE_WARMER_INTERVAL", "300"))
+    CACHE_WARMER_RATE = float(os.environ.get("CACHE_WARMER_RATE", "1"))
+    CACHE_WARMER_REFRESH_AHEAD = int(os.environ.get("CACHE_WARMER_REFRESH_AHEAD", "600"))
+    CACHE_WARMER_BATCH_SIZE = int(os.environ.get("CACHE_WARMER_BATCH_SIZE", "50"))
+
+    # Busquedas: TTL (s) y tamano de la cache de resultados normalizados
+    SPOTIFY_SEARCH_CACHE_TTL = int(os.environ.get("SPOTIFY_SEARCH_CACHE_TTL", "60"))
+    SPOTIFY_SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SPOTIFY_SEARCH_CACHE_MAX_ENTRIES", "2000"))
+
+    # Indice local de busqueda (trigramas) sobre lo ya cacheado: max. entidades por tipo y
+    # ventana de recencia (slots por lista) en la que se buscan coincidencias aproximadas
+    SEARCH_INDEX_ENABLED = os.environ.get("SEARCH_INDEX_ENABLED", "1") == "1"
+    SEARCH_INDEX_MAX_ENTITIES = int(os.environ.get("SEARCH_INDEX_MAX_ENTITIES", "100000"))
+    SEARCH_INDEX_MAX_CANDIDATES = int(os.environ.get("SEARCH_INDEX_MAX_CANDIDATES", "5000"))
+
+    # Disyuntores por familia de endpoints (search, tracks, albums, artists): se abren
+    # con ERROR_RATE de errores o SLOW_RATE de llamadas lentas en las ultimas WINDOW
+    SPOTIFY_BREAKER_ENABLED = os.environ.get("SPOTIFY_BREAKER_ENABLED", "1") == "1"
+    SPOTIFY_BREAKER_WINDOW = int(os.environ.get("SPOTIFY_BREAKER_WINDOW", "20"))
+    SPOTIFY_BREAKER_MIN_CALLS = int(os.environ.get("SPOTIFY_BREAKER_MIN_CALLS", "10"))
+    SPOTIFY_BREAKER_ERROR_RATE = float(os.environ.get("SPOTIFY_BREAKER_ERROR_RATE", "0.5"))
+    SPOTIFY_BREAKER_SLOW_CALL_SECONDS = float(os.environ.get("SPOTIFY_BREAKER_SLOW_CALL_SECONDS", "2"))
+    SPOTIFY_BREAKER_SLOW_RATE = float(os.environ.get("SPOTIFY_BREAKER_SLOW_RATE", "0.8"))
+    SPOTIFY_BREAKER_OPEN_SECONDS = float(os.environ.get("SPOTIFY_BREAKER_OPEN_SECONDS", "30"))
+    SPOTIFY_BREAKER_HALF_OPEN_CALLS = int(os.environ.get("SPOTIFY_BREAKER_HALF_OPEN_CALLS", "3"))
+
+    # Planificador upstream: token bucket, concurrencia maxima y espera maxima por turno (s)
+    SPOTIFY_RATE_LIMIT_PER_SECOND = float(os.environ.get("SPOTIFY_RATE_LIMIT_PER_SECOND", "20"))
+    SPOTIFY_RATE_LIMIT_BURST = int(os.environ.get("SPOTIFY_RATE_LIMIT_BURST", "40"))
+    SPOTIFY_MAX_CONCURRENCY = int(os.environ.get("SPOTIFY_MAX_CONCURRENCY", "16"))
+    SPOTIFY_SCHEDULER_MAX_WAIT = float(os.environ.get("SPOTIFY_SCHEDULER_MAX_WAIT", "10"))
+    SPOTIFY_429_RETRIES = int(os.environ.get("SPOTIFY_429_RETRIES", "1"))
+
+    # Fan-out de llamadas upstream en paralelo: limite global, por peticion y deadline (s)
+    SPOTIFY_FANOUT_MAX_WORKERS = int(os.environ.get("SPOTIFY_FANOUT_MAX_WORKERS", "16"))
+    SPOTIFY_FANOUT_PER_REQUEST = int(os.environ.get("SPOTIFY_FANOUT_PER_REQUEST", "4"))
+    SPOTIFY_FANOUT_DEADLINE = float(os.environ.get("SPOTIFY_FANOUT_DEADLINE", "8"))
+
+    # Perfilado por peticion: fraccion muestreada, token de la cabecera X-Profile, modo
+    # "cprofile" (.pstats) o "sampler" (pilas colapsadas .folded) y anillo de archivos
+    PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+    PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "")
+    PROFILING_MODE = os.environ.get("PROFILING_MODE", "cprofile")
+    PROFILING_SAMPLER_INTERVAL_MS = float(os.environ.get("PROFILING_SAMPLER_INTERVAL_MS", "5"))
+    PROFILING_DIR = os.environ.get(
+        "PROFILING_DIR",
+        os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "profiles"))
+    )
+    PROFILING_MAX_PROFILES = int(os.environ.get("PROFILING_MAX_PROFILES", "200"))
 
     # Ruta del JSON de usuarios (se puede sobreescribir por variable de entorno)
     USERS_DATA_PATH = os.environ.get(
@@ -21,4 +114,12 @@ class Configuration:
         os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "users.json"))
     )
 
-    
+    # Motor de almacenamiento de usuarios: "json" (archivo unico), "journal" (log + snapshot) o "sqlite"
+    USERS_BACKEND = os.environ.get("USERS_BACKEND", "json")
+    # sqlite: ruta de la base (por defecto, junto a USERS_DATA_PATH con extension .db)
+    USERS_SQLITE_PATH = os.environ.get("USERS_SQLITE_PATH")
+    # journal: mutaciones entre compactaciones y espera (ms) para agrupar fsyncs
+    USERS_JOURNAL_COMPACT_EVERY = int(os.environ.get("USERS_JOURNAL_COMPACT_EVERY", "1000"))
+    USERS_JOURNAL_GROUP_COMMIT_MS = float(os.environ.get("USERS_JOURNAL_GROUP_COMMIT_MS", "0"))
+    # Alta masiva (POST /v1/users:bulk): maximo de lineas NDJSON por peticion
+    USERS_BULK_MAX_LINES = int(os.environ.get("USERS_BULK_MAX_LINES", "100000"))
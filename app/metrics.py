@@ -0,0 +1,272 @@
+"""
+Metricas en formato texto de Prometheus.
+
+Cada hilo escribe en su propio shard (sin locks en el camino caliente); al
+servir /metrics se suman todos los shards. Cuando un hilo termina (el
+servidor de desarrollo crea uno por peticion), su shard se suma a un
+acumulado de hilos retirados y deja de recorrerse.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    __slots__ = ("counters", "gauges", "histograms")
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def merge(self, other):
+        """Suma en este shard los valores de `other`."""
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, value in list(other.gauges.items()):
+            self.gauges[key] = self.gauges.get(key, 0) + value
+        for key, entry in list(other.histograms.items()):
+            merged = self.histograms.setdefault(key, [0] * len(entry[:-1]) + [0.0])
+            for i, value in enumerate(list(entry)):
+                merged[i] += value
+
+
+class _ThreadToken:
+    """Centinela por hilo: se libera con el threading.local al terminar el hilo."""
+
+    __slots__ = ("__weakref__",)
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        # Valores de los hilos que ya terminaron (solo se toca con _shards_lock)
+        self._retired = _Shard()
+        self._help = {}
+        self._collectors = []
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            token = _ThreadToken()
+            self._local.shard = shard
+            self._local.token = token
+            weakref.finalize(token, self._retire, shard)
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards.remove(shard)
+            self._retired.merge(shard)
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def gauge_add(self, name, labels=(), value=1):
+        gauges = self._shard().gauges
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            # [cuenta por bucket..., +Inf, suma]
+            entry = [0] * (len(self.buckets) + 1) + [0.0]
+            histograms[key] = entry
+        entry[bisect_left(self.buckets, seconds)] += 1
+        entry[-1] += seconds
+
+    def register_collector(self, collector):
+        """`collector()` devuelve [(nombre, tipo, ayuda, [(labels, valor), ...]), ...]."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def _merged(self):
+        total = _Shard()
+        with self._shards_lock:
+            shards = list(self._shards)
+            total.merge(self._retired)
+        for shard in shards:
+            total.merge(shard)
+        return total.counters, total.gauges, total.histograms
+
+    def render(self):
+        counters, gauges, histograms = self._merged()
+        lines = []
+        seen = set()
+
+        def header(name, default_kind):
+            if name in seen:
+                return
+            seen.add(name)
+            kind, help_text = self._help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), entry in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {entry[-1]}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("http_requests_total", "counter", "Peticiones HTTP atendidas por ruta, metodo y estado")
+metrics.describe("http_request_duration_seconds", "histogram", "Latencia de las peticiones HTTP por ruta")
+metrics.describe("http_requests_in_flight", "gauge", "Peticiones HTTP en curso")
+metrics.describe("spotify_upstream_requests_total", "counter", "Llamadas a Spotify por metodo del servicio y estado")
+metrics.describe("spotify_upstream_duration_seconds", "histogram", "Latencia de las llamadas a Spotify por metodo del servicio y estado")
+metrics.describe("spotify_upstream_in_flight", "gauge", "Llamadas a Spotify en curso")
+metrics.describe("http_stale_responses_total", "counter", "Respuestas servidas con datos caducados por fallo de Spotify")
+
+
+def route_label():
+    """Patron de la ruta atendida (p. ej. /v1/tracks/<string:track_id>)."""
+    rule = request.url_rule
+    return rule.rule if rule is not None else "<unmatched>"
+
+
+def _service_collector():
+    """Contadores de los componentes compartidos de SpotifyService."""
+    from .services.circuit_breaker import all_breakers
+    from .services.coalescer import all_coalescers
+    from .services.metadata_cache import all_caches
+    from .services.rate_limiter import all_schedulers
+    from .services.search_index import all_search_indexes
+    from .services.token_manager import all_token_managers
+
+    token = [m.stats() for m in all_token_managers()]
+    caches = [c.stats() for c in all_caches()]
+    searches = [c.stats() for c in all_coalescers()]
+    schedulers = [s.stats() for s in all_schedulers()]
+    indexes = [i.stats() for i in all_search_indexes()]
+    breakers = [b.stats() for b in all_breakers()]
+    return [
+        ("spotify_token_refresh_total", "counter", "Refrescos del token de Spotify",
+         [((), sum(t["refresh_count"] for t in token))]),
+        ("spotify_token_wait_seconds_total", "counter", "Tiempo esperando un refresco en curso",
+         [((), sum(t["wait_time_total"] for t in token))]),
+        ("spotify_metadata_cache_hits_total", "counter", "Aciertos de la cache de metadatos",
+         [((), sum(c["hits"] + c["stale_hits"] for c in caches))]),
+        ("spotify_metadata_cache_misses_total", "counter", "Fallos de la cache de metadatos",
+         [((), sum(c["misses"] for c in caches))]),
+        ("spotify_metadata_cache_evictions_total", "counter", "Expulsiones de la cache de metadatos",
+         [((), sum(c["evictions"] for c in caches))]),
+        ("spotify_disk_cache_hits_total", "counter", "Aciertos de la cache de metadatos en disco",
+         [((), sum(c.get("disk_hits", 0) for c in caches))]),
+        ("spotify_disk_cache_errors_total", "counter", "Errores de la cache de metadatos en disco",
+         [((), sum(c.get("disk_errors", 0) for c in caches))]),
+        ("spotify_metadata_cache_entries", "gauge", "Entradas en la cache de metadatos",
+         [((), sum(c["entries"] for c in caches))]),
+        ("spotify_search_requests_total", "counter", "Busquedas recibidas",
+         [((), sum(s["requests"] for s in searches))]),
+        ("spotify_search_cache_hits_total", "counter", "Busquedas servidas desde cache",
+         [((), sum(s["cache_hits"] for s in searches))]),
+        ("spotify_search_coalesced_total", "counter", "Busquedas agrupadas con otra en vuelo",
+         [((), sum(s["coalesced"] for s in searches))]),
+        ("search_index_entities", "gauge", "Entidades en el indice local de busqueda",
+         [((), sum(i["entities"] for i in indexes))]),
+        ("search_index_postings", "gauge", "Apariciones de trigramas en el indice local de busqueda",
+         [((), sum(i["postings"] for i in indexes))]),
+        ("search_index_queries_total", "counter", "Busquedas respondidas desde el indice local",
+         [((), sum(i["queries"] for i in indexes))]),
+        ("spotify_circuit_state", "gauge", "Disyuntor por familia: 0 cerrado, 1 medio abierto, 2 abierto",
+         [((("family", b["family"]),), {"closed": 0, "half_open": 1, "open": 2}[b["state"]]) for b in breakers]),
+        ("spotify_circuit_opened_total", "counter", "Veces que se ha abierto el disyuntor",
+         [((("family", b["family"]),), b["opened"]) for b in breakers]),
+        ("spotify_circuit_rejected_total", "counter", "Llamadas rechazadas por el disyuntor abierto",
+         [((("family", b["family"]),), b["rejected"]) for b in breakers]),
+        ("spotify_scheduler_queue_depth", "gauge", "Llamadas esperando turno upstream",
+         [((), sum(s["queue_depth"] for s in schedulers))]),
+        ("spotify_scheduler_throttle_seconds_total", "counter", "Tiempo esperando turno upstream",
+         [((), sum(s["throttle_time_total"] for s in schedulers))]),
+        ("spotify_scheduler_throttled_total", "counter", "Respuestas 429 de Spotify",
+         [((), sum(s["throttled"] for s in schedulers))]),
+    ]
+
+
+def init_metrics(app, registry=metrics):
+    """Registra los hooks de medicion y la ruta /metrics en la app."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        registry.gauge_add("http_requests_in_flight")
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            _record(started, response.status_code)
+            g._metrics_finished = True
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            # Excepcion no gestionada: after_request no llego a ejecutarse
+            _record(started, 500)
+            g._metrics_finished = True
+        if g.pop("_metrics_finished", False):
+            registry.gauge_add("http_requests_in_flight", value=-1)
+
+    def _record(started, status):
+        labels = (("route", route_label()), ("method", request.method))
+        registry.inc("http_requests_total", labels + (("status", status),))
+        registry.observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+
+    registry.register_collector(_service_collector)
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        """Metricas en formato texto de Prometheus."""
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
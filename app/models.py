@@ -0,0 +1,139 @@
+"""
+Modelo compacto de las entidades de Spotify que sirve la API.
+
+El JSON de Spotify trae mucho mas de lo que exponemos (mercados, imagenes,
+objetos anidados...). Se convierte una sola vez, al recibirlo, en objetos
+con __slots__ que guardan solo los campos de los esquemas; las caches y los
+handlers trabajan con estos objetos y `to_dict()` produce la proyeccion
+publica.
+"""
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+def _names(items):
+    # Nombres de artistas y generos se repiten mucho entre entidades
+    return tuple(sys.intern(item.get("name", "")) for item in items or ())
+
+
+@dataclass(frozen=True, slots=True)
+class Track:
+    id: str
+    name: str
+    artists: Tuple[str, ...]
+    album: str
+    duration_ms: Optional[int]
+    preview_url: Optional[str]
+    external_url: Optional[str]
+
+    # Campos de TrackSchema (busqueda y favoritos); FullTrackSchema usa todos
+    SUMMARY_FIELDS = ("id", "name", "artists", "album", "preview_url", "external_url")
+
+    def to_dict(self, fields=None):
+        return _to_dict(self, TRACK_FIELDS if fields is None else fields)
+
+
+@dataclass(frozen=True, slots=True)
+class Album:
+    id: str
+    name: str
+    artists: Tuple[str, ...]
+    release_date: Optional[str]
+    total_tracks: Optional[int]
+    external_url: Optional[str]
+
+    def to_dict(self, fields=None):
+        return _to_dict(self, ALBUM_FIELDS if fields is None else fields)
+
+
+@dataclass(frozen=True, slots=True)
+class Artist:
+    id: str
+    name: str
+    genres: Tuple[str, ...]
+    followers: Optional[int]
+    external_url: Optional[str]
+
+    def to_dict(self, fields=None):
+        return _to_dict(self, ARTIST_FIELDS if fields is None else fields)
+
+
+TRACK_FIELDS = Track.__slots__
+ALBUM_FIELDS = Album.__slots__
+ARTIST_FIELDS = Artist.__slots__
+
+
+def _to_dict(entity, fields):
+    result = {}
+    for name in fields:
+        value = getattr(entity, name)
+        result[name] = list(value) if isinstance(value, tuple) else value
+    return result
+
+
+def track_from_spotify(data):
+    return Track(
+        id=data.get("id"),
+        name=data.get("name", ""),
+        artists=_names(data.get("artists")),
+        album=(data.get("album") or {}).get("name", ""),
+        duration_ms=data.get("duration_ms"),
+        preview_url=data.get("preview_url"),
+        external_url=(data.get("external_urls") or {}).get("spotify"),
+    )
+
+
+def album_from_spotify(data):
+    return Album(
+        id=data.get("id"),
+        name=data.get("name", ""),
+        artists=_names(data.get("artists")),
+        release_date=data.get("release_date"),
+        total_tracks=data.get("total_tracks"),
+        external_url=(data.get("external_urls") or {}).get("spotify"),
+    )
+
+
+def artist_from_spotify(data):
+    return Artist(
+        id=data.get("id"),
+        name=data.get("name", ""),
+        genres=tuple(sys.intern(genre) for genre in data.get("genres") or ()),
+        followers=(data.get("followers") or {}).get("total"),
+        external_url=(data.get("external_urls") or {}).get("spotify"),
+    )
+
+
+MAPPERS = {
+    "track": track_from_spotify,
+    "album": album_from_spotify,
+    "artist": artist_from_spotify,
+}
+
+
+ENTITY_TYPES = {"track": Track, "album": Album, "artist": Artist}
+
+
+def from_dict(kind, data):
+    """Reconstruye una entidad a partir de su `to_dict()` (p. ej. desde la cache en disco)."""
+    return ENTITY_TYPES[kind](**{
+        name: tuple(sys.intern(item) for item in value) if isinstance(value, list) else value
+        for name, value in data.items()
+    })
+
+
+def from_spotify(kind, data):
+    """Convierte el JSON de Spotify de una entidad `kind` en su objeto compacto."""
+    return MAPPERS[kind](data)
+
+
+def pick_fields(base, requested):
+    """Campos de `base` (en su orden) que estan en `requested`; `base` si no se pidio nada."""
+    if requested is None:
+        return base
+    return tuple(name for name in base if name in requested)
+
+
+def to_dicts(entities, fields=None):
+    return [entity.to_dict(fields) for entity in entities]
@@ -0,0 +1,226 @@
+"""
+Perfilado opcional por peticion (PROFILING_ENABLED=1).
+
+Se perfila una fraccion aleatoria de las peticiones (PROFILING_SAMPLE_RATE)
+y cualquier peticion con la cabecera `X-Profile: <PROFILING_TOKEN>`. Dos
+modos:
+
+- cprofile: cProfile sobre el hilo de la peticion; se guarda un `.pstats`
+  (`python -m pstats`, snakeviz...).
+- sampler: un hilo toma la pila del hilo de la peticion cada
+  PROFILING_SAMPLER_INTERVAL_MS y se guarda en formato colapsado `.folded`
+  (una pila por linea con su numero de muestras: flamegraph.pl, speedscope).
+
+Cada perfil va acompanado de un `.json` con la ruta, el estado, la duracion
+y las llamadas a Spotify de la peticion (operacion, estado y milisegundos),
+que cubren tambien lo hecho en los hilos del fan-out. Los archivos forman un
+anillo en PROFILING_DIR: al pasar de PROFILING_MAX_PROFILES se borran los
+mas antiguos. La respuesta perfilada lleva `X-Profile-Id` con el nombre base.
+"""
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from flask import g, request
+
+from .metrics import route_label
+
+EXTENSIONS = (".json", ".pstats", ".folded")
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9]+")
+
+
+def _frame_label(code):
+    path = Path(code.co_filename)
+    return f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Muestrea la pila de un hilo cada `interval` segundos y la cuenta colapsada."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, token="", mode="cprofile", interval=0.005, max_profiles=200):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.token = token
+        self.mode = mode
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self.profiled = 0
+
+    def reason(self):
+        """Por que perfilar la peticion actual ("header" o "sample"); None si no toca."""
+        header = request.headers.get("X-Profile")
+        if header and self.token and hmac.compare_digest(header.encode(), self.token.encode()):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def start(self):
+        if self.mode == "sampler":
+            profiler = StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def stop(self, profiler):
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+        else:
+            profiler.disable()
+
+    def profile_id(self):
+        route = _UNSAFE.sub("_", f"{request.method} {route_label()}").strip("_")
+        return f"{time.time_ns() // 1000:x}-{os.getpid()}-{route}"
+
+    def save(self, profile_id, profiler, meta):
+        """Escribe el perfil y su `.json` y recorta el anillo."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        base = self.directory / profile_id
+        if isinstance(profiler, StackSampler):
+            profiler.write(base.with_suffix(".folded"))
+        else:
+            profiler.dump_stats(str(base.with_suffix(".pstats")))
+        # El .json va el ultimo: su presencia indica que el perfil esta completo
+        with open(base.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            self.profiled += 1
+            self._trim()
+
+    def _trim(self):
+        # Los nombres empiezan por el instante en hexadecimal: el orden es el de llegada
+        profiles = sorted(path.stem for path in self.directory.glob("*.json"))
+        for stem in profiles[:max(0, len(profiles) - self.max_profiles)]:
+            for extension in EXTENSIONS:
+                try:
+                    (self.directory / stem).with_suffix(extension).unlink()
+                except FileNotFoundError:
+                    pass
+
+
+def upstream_calls(since):
+    """
+    Llamadas a Spotify de la peticion actual en orden de inicio:
+    [{"operation", "status", "start_ms", "ms"}], con `start_ms` desde `since`.
+    """
+    calls = []
+    for service in g.get("spotify_services", ()):
+        calls.extend(service.upstream_calls or ())
+    return [
+        {
+            "operation": operation,
+            "status": status,
+            "start_ms": round((started - since) * 1000, 3),
+            "ms": round(seconds * 1000, 3),
+        }
+        for operation, status, started, seconds in sorted(calls, key=lambda call: call[2])
+    ]
+
+
+def init_profiling(app):
+    """Registra los hooks de perfilado si PROFILING_ENABLED esta activo."""
+    if not app.config.get("PROFILING_ENABLED", False):
+        return None
+    profiler = RequestProfiler(
+        app.config.get("PROFILING_DIR") or "profiles",
+        sample_rate=app.config.get("PROFILING_SAMPLE_RATE", 0.0),
+        token=app.config.get("PROFILING_TOKEN", ""),
+        mode=app.config.get("PROFILING_MODE", "cprofile"),
+        interval=app.config.get("PROFILING_SAMPLER_INTERVAL_MS", 5) / 1000.0,
+        max_profiles=app.config.get("PROFILING_MAX_PROFILES", 200),
+    )
+    app.extensions["request_profiler"] = profiler
+
+    @app.before_request
+    def _start_profile():
+        reason = profiler.reason()
+        if reason is None:
+            return
+        try:
+            running = profiler.start()
+        except ValueError:
+            # Otro perfilador activo en el proceso (cProfile con sys.monitoring en 3.12+)
+            return
+        g.record_upstream_calls = True
+        g._profile = (running, reason, time.time(), time.perf_counter())
+
+    @app.after_request
+    def _tag_profile(response):
+        if "_profile" in g:
+            g._profile_status = response.status_code
+            g._profile_id = profiler.profile_id()
+            response.headers["X-Profile-Id"] = g._profile_id
+        return response
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        state = g.pop("_profile", None)
+        if state is None:
+            return
+        running, reason, started_at, started = state
+        profiler.stop(running)
+        duration = time.perf_counter() - started
+        calls = upstream_calls(started)
+        meta = {
+            "route": route_label(),
+            "method": request.method,
+            "path": request.path,
+            "status": g.pop("_profile_status", 500),
+            "reason": reason,
+            "mode": profiler.mode,
+            "started_at": started_at,
+            "duration_ms": round(duration * 1000, 3),
+            "upstream_ms": round(sum(call["ms"] for call in calls), 3),
+            "upstream_calls": calls,
+        }
+        if exc is not None:
+            meta["error"] = repr(exc)
+        try:
+            profiler.save(g.pop("_profile_id", None) or profiler.profile_id(), running, meta)
+        except OSError:
+            app.logger.exception("No se pudo guardar el perfil de %s", request.path)
+
+    return profiler
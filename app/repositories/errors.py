@@ -0,0 +1,2 @@
+class UserConflictError(ValueError):
+    """El usuario viola una restriccion de unicidad (p. ej. email repetido)."""
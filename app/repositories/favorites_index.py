@@ -0,0 +1,211 @@
+"""
+Indice invertido de favoritos: id de track o artista -> usuarios que lo tienen.
+
+Cada usuario ocupa una fila entera; por cada tipo se guarda, para cada item,
+las filas que lo tienen (en orden de insercion) y, por fila, sus items y su
+numero. Con eso "quien tiene X" es una consulta directa y la similitud de
+un usuario U con todos los demas sale de sus listas: la interseccion con
+cada fila es cuantas veces aparece esa fila en las listas de los items de
+U, sin recorrer el resto de usuarios. El recuento se hace con un Counter y
+el top-k con heapq; es el camino soportado (numpy no esta en
+requirements.txt). Si NumPy esta instalado se usa en su lugar un camino
+vectorizado (`bincount` y `argpartition`) con el mismo resultado.
+"""
+import heapq
+import math
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional
+    np = None
+
+# Tipo de favorito -> campo del usuario
+KINDS = {"tracks": "favorite_tracks", "artists": "favorite_artists"}
+METRICS = ("jaccard", "cosine")
+
+
+class FavoritesIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Version del store con la que esta al dia (None: hay que reconstruir)
+        self.version: Optional[str] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._dead = 0      # filas vacias de usuarios borrados
+        self._row_of: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._postings = {kind: {} for kind in KINDS}
+        self._items = {kind: [] for kind in KINDS}
+        self._sizes = {kind: array("i") for kind in KINDS}
+
+    # -- mantenimiento ----------------------------------------------------
+
+    def rebuild(self, users: Iterable[Dict], version: str) -> None:
+        with self._lock:
+            self._reset()
+            for user in users:
+                self._add(user)
+            self.version = version
+
+    def add(self, user: Dict) -> None:
+        """Anade o reemplaza los favoritos de `user` (un usuario existente conserva su fila)."""
+        with self._lock:
+            row = self._row_of.get(user["id"])
+            if row is None:
+                self._add(user)
+            else:
+                self._replace(row, user)
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            self._remove(user_id)
+
+    def _add(self, user: Dict) -> None:
+        row = len(self._ids)
+        self._ids.append(user["id"])
+        self._row_of[user["id"]] = row
+        for kind, field in KINDS.items():
+            items = tuple(dict.fromkeys(user.get(field) or ()))
+            postings = self._postings[kind]
+            for item in items:
+                postings.setdefault(item, {})[row] = None
+            self._items[kind].append(items)
+            self._sizes[kind].append(len(items))
+
+    def _replace(self, row: int, user: Dict) -> None:
+        """Actualiza las listas solo con la diferencia de items de la fila."""
+        for kind, field in KINDS.items():
+            items = tuple(dict.fromkeys(user.get(field) or ()))
+            old = self._items[kind][row]
+            if items == old:
+                continue
+            postings = self._postings[kind]
+            kept = set(items)
+            for item in old:
+                if item not in kept:
+                    rows = postings[item]
+                    del rows[row]
+                    if not rows:
+                        del postings[item]
+            previous = set(old)
+            for item in items:
+                if item not in previous:
+                    postings.setdefault(item, {})[row] = None
+            self._items[kind][row] = items
+            self._sizes[kind][row] = len(items)
+
+    def _remove(self, user_id: str) -> None:
+        # La fila queda vacia; con muchas vacias se compacta el indice
+        row = self._row_of.pop(user_id, None)
+        if row is None:
+            return
+        self._ids[row] = None
+        for kind in KINDS:
+            postings = self._postings[kind]
+            for item in self._items[kind][row]:
+                rows = postings.get(item)
+                if rows is not None:
+                    rows.pop(row, None)
+                    if not rows:
+                        del postings[item]
+            self._items[kind][row] = ()
+            self._sizes[kind][row] = 0
+        self._dead += 1
+        if self._dead > max(1024, len(self._ids) // 4):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Renumera las filas vivas (en el mismo orden) descartando las vacias."""
+        live = [
+            {"id": user_id, **{field: self._items[kind][row] for kind, field in KINDS.items()}}
+            for row, user_id in enumerate(self._ids)
+            if user_id is not None
+        ]
+        self._reset()
+        for user in live:
+            self._add(user)
+
+    # -- consultas --------------------------------------------------------
+
+    def users_with(self, kind: str, item_id: str, limit: Optional[int] = None) -> Tuple[int, List[str]]:
+        """(total, ids) de los usuarios que tienen `item_id` entre sus favoritos `kind`."""
+        with self._lock:
+            rows = self._postings[kind].get(item_id, {})
+            ids = [self._ids[row] for row in rows] if limit is None else [
+                self._ids[row] for row, _ in zip(rows, range(limit))
+            ]
+            return len(rows), ids
+
+    def similar(self, user_id: str, k: int = 10, metric: str = "jaccard",
+                kinds: Iterable[str] = tuple(KINDS)) -> Optional[List[Dict]]:
+        """
+        Los `k` usuarios mas parecidos a `user_id` segun `metric` sobre los
+        favoritos de `kinds`, como [{"id", "score", "shared"}] de mayor a
+        menor. None si el usuario no esta en el indice.
+        """
+        kinds = tuple(kinds)
+        with self._lock:
+            row = self._row_of.get(user_id)
+            if row is None:
+                return None
+            query = [self._postings[kind][item] for kind in kinds for item in self._items[kind][row]]
+            size = sum(self._sizes[kind][row] for kind in kinds)
+            if np is not None:
+                return self._similar_numpy(row, query, size, k, metric, kinds)
+            return self._similar_python(row, query, size, k, metric, kinds)
+
+    def _similar_numpy(self, row, query, size, k, metric, kinds):
+        n = len(self._ids)
+        if not query:
+            return []
+        postings = np.fromiter(
+            (other for rows in query for other in rows), dtype=np.int32,
+            count=sum(len(rows) for rows in query),
+        )
+        shared = np.bincount(postings, minlength=n)
+        shared[row] = 0
+        candidates = np.flatnonzero(shared)
+        if not candidates.size:
+            return []
+        shared = shared[candidates]
+        sizes = sum(np.frombuffer(self._sizes[kind], dtype=np.int32)[candidates] for kind in kinds)
+        if metric == "cosine":
+            scores = shared / np.sqrt(float(size) * sizes)
+        else:
+            scores = shared / (size + sizes - shared)
+        if candidates.size > k:
+            # Umbral del k-esimo mejor; los empates en el umbral entran todos
+            threshold = np.partition(scores, candidates.size - k)[candidates.size - k]
+            top = np.flatnonzero(scores >= threshold)
+        else:
+            top = np.arange(candidates.size)
+        # Desempate estable por fila (orden de alta)
+        top = top[np.lexsort((candidates[top], -scores[top]))][:k]
+        return [
+            {"id": self._ids[candidates[i]], "score": round(float(scores[i]), 6), "shared": int(shared[i])}
+            for i in top
+        ]
+
+    def _similar_python(self, row, query, size, k, metric, kinds):
+        shared = Counter()
+        for rows in query:
+            shared.update(rows.keys())
+        shared.pop(row, None)
+
+        def score(other):
+            common = shared[other]
+            other_size = sum(self._sizes[kind][other] for kind in kinds)
+            if metric == "cosine":
+                return common / math.sqrt(size * other_size)
+            return common / (size + other_size - common)
+
+        scored = ((score(other), -other) for other in shared)
+        return [
+            {"id": self._ids[-neg_row], "score": round(value, 6), "shared": shared[-neg_row]}
+            for value, neg_row in heapq.nlargest(k, scored)
+        ]
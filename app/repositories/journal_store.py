@@ -0,0 +1,357 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .errors import UserConflictError
+
+
+class JournalUserStore:
+    """
+    Usuarios en un log de solo-anadir con snapshot compactado.
+
+    Archivos (junto a `path`):
+      - `<path>.snapshot`: {"generation": N, "users": [...]}
+      - `<path>.journal.<N>`: una mutacion JSON por linea ("put"/"del")
+
+    Cada mutacion se anade al journal de la generacion actual y se confirma
+    con fsync agrupado: un solo hilo hace fsync por todas las escrituras
+    pendientes. Al arrancar se carga el snapshot y se reproducen los journals
+    posteriores. Cada `compact_every` mutaciones, un hilo en segundo plano
+    escribe un snapshot nuevo (archivo temporal + rename atomico) y borra los
+    journals ya incluidos en el.
+    """
+
+    def __init__(self, path: Path, seed: List[Dict], compact_every: int = 1000, group_commit_ms: float = 0):
+        self.path = Path(path)
+        self.seed = seed
+        self.compact_every = compact_every
+        self.group_commit_delay = group_commit_ms / 1000.0
+
+        self._users: "OrderedDict[str, Dict]" = OrderedDict()
+        self._by_email: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        # Version del contenido en memoria (para invalidar el orden cacheado)
+        self._version = 0
+        # XOR de los hashes de cada usuario (data_version); None hasta la primera consulta
+        self._digest: Optional[int] = None
+        self._order_version = -1
+        self._order = ([], {})
+
+        # Estado del fsync agrupado
+        self._sync_cond = threading.Condition()
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+
+        self._compacting = False
+        self._log_records = 0
+        self.compactions = 0
+        self.fsyncs = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._generation = self._replay()
+        self._log = self._open_log(self._generation)
+
+    # -- archivos ---------------------------------------------------------
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".snapshot")
+
+    def _journal_path(self, generation: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.journal.{generation}")
+
+    def _journal_generations(self) -> List[int]:
+        prefix = self.path.name + ".journal."
+        generations = []
+        for candidate in self.path.parent.glob(prefix + "*"):
+            suffix = candidate.name[len(prefix):]
+            if suffix.isdigit():
+                generations.append(int(suffix))
+        return sorted(generations)
+
+    def _fsync_dir(self) -> None:
+        try:
+            fd = os.open(self.path.parent, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _open_log(self, generation: int):
+        journal = self._journal_path(generation)
+        if journal.exists():
+            # Descarta una ultima linea incompleta (caida a mitad de escritura)
+            with journal.open("rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        log = journal.open("a", encoding="utf-8")
+        self._fsync_dir()
+        return log
+
+    # -- arranque ---------------------------------------------------------
+
+    def _load_initial(self) -> tuple:
+        if self.snapshot_path.exists():
+            with self.snapshot_path.open("r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            return snapshot["users"], snapshot["generation"]
+
+        # Sin snapshot: se parte del JSON clasico si existe (migracion)
+        if self.path.exists():
+            try:
+                with self.path.open("r", encoding="utf-8") as f:
+                    content = f.read().strip()
+                if content:
+                    return json.loads(content), 0
+            except json.JSONDecodeError:
+                pass
+        return list(self.seed), 0
+
+    def _replay(self) -> int:
+        users, generation = self._load_initial()
+        for user in users:
+            self._apply({"op": "put", "user": user})
+
+        for journal_generation in self._journal_generations():
+            if journal_generation < generation:
+                continue
+            generation = journal_generation
+            with self._journal_path(journal_generation).open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Linea final truncada: todo lo anterior es valido
+                        break
+                    self._apply(record)
+                    self._log_records += 1
+        return generation
+
+    def _apply(self, record: Dict) -> None:
+        self._version += 1
+        if record["op"] == "put":
+            user = record["user"]
+            previous = self._users.get(user["id"])
+            if self._digest is not None:
+                self._digest ^= _user_digest(user) ^ (_user_digest(previous) if previous else 0)
+            if previous is not None:
+                self._drop_email(previous)
+            self._users[user["id"]] = user
+            self._by_email[user.get("email")] = user
+        elif record["op"] == "del":
+            previous = self._users.pop(record["id"], None)
+            if previous is not None:
+                self._drop_email(previous)
+                if self._digest is not None:
+                    self._digest ^= _user_digest(previous)
+
+    def _drop_email(self, user: Dict) -> None:
+        # Solo si el indice apunta a este usuario (journals antiguos pueden tener emails repetidos)
+        owner = self._by_email.get(user.get("email"))
+        if owner is not None and owner["id"] == user["id"]:
+            del self._by_email[user.get("email")]
+
+    # -- escritura --------------------------------------------------------
+
+    def _append(self, record: Dict) -> int:
+        """Anade la mutacion al journal y la aplica en memoria. Requiere el lock."""
+        self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._log.flush()
+        self._apply(record)
+        self._log_records += 1
+        self._written += 1
+        return self._written
+
+    def _commit(self, seq: int) -> None:
+        """Espera a que `seq` este en disco; un lider hace fsync por el grupo."""
+        with self._sync_cond:
+            while self._synced < seq:
+                if not self._syncing:
+                    self._syncing = True
+                    break
+                self._sync_cond.wait()
+            else:
+                return
+
+        target = None
+        try:
+            if self.group_commit_delay:
+                # Ventana para que mas escritores se unan al mismo fsync
+                time.sleep(self.group_commit_delay)
+            with self._lock:
+                target = self._written
+                fd = self._log.fileno()
+            os.fsync(fd)
+            self.fsyncs += 1
+        finally:
+            with self._sync_cond:
+                self._syncing = False
+                if target is not None:
+                    self._synced = max(self._synced, target)
+                self._sync_cond.notify_all()
+
+    def _write(self, record: Dict) -> tuple:
+        """Anade la mutacion y decide si toca compactar. Requiere el lock."""
+        seq = self._append(record)
+        should_compact = bool(
+            self.compact_every
+            and self._log_records >= self.compact_every
+            and not self._compacting
+        )
+        if should_compact:
+            self._compacting = True
+        return seq, should_compact
+
+    def _finish(self, seq: int, should_compact: bool) -> None:
+        """Confirma en disco (fuera del lock) y lanza la compactacion si toca."""
+        self._commit(seq)
+        if should_compact:
+            threading.Thread(target=self._compact, name="users-journal-compact", daemon=True).start()
+
+    # -- compactacion -----------------------------------------------------
+
+    def _compact(self) -> None:
+        try:
+            with self._lock:
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                with self._sync_cond:
+                    self._synced = max(self._synced, self._written)
+                users = list(self._users.values())
+                old_log = self._log
+                self._generation += 1
+                generation = self._generation
+                self._log = self._open_log(generation)
+                self._log_records = 0
+
+            tmp = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "users": users}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+            self._fsync_dir()
+
+            # Un fsync en curso puede tener aun el descriptor del journal viejo
+            with self._sync_cond:
+                while self._syncing:
+                    self._sync_cond.wait()
+                old_log.close()
+
+            for old_generation in self._journal_generations():
+                if old_generation < generation:
+                    self._journal_path(old_generation).unlink(missing_ok=True)
+            self.compactions += 1
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def compact(self) -> None:
+        """Compacta de forma sincrona (util para scripts de mantenimiento)."""
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        self._compact()
+
+    # -- API de store -----------------------------------------------------
+
+    def all_users(self) -> List[Dict]:
+        with self._lock:
+            return list(self._users.values())
+
+    def page(self, limit: int, after: Optional[str] = None) -> Optional[List[Dict]]:
+        """Hasta `limit` usuarios tras el id `after` (None si `after` no existe)."""
+        with self._lock:
+            if after is not None and after not in self._users:
+                return None
+            users, position = self._ordered()
+            start = position[after] + 1 if after is not None else 0
+            return users[start:start + limit]
+
+    def _ordered(self) -> tuple:
+        """Lista ordenada de usuarios y posicion por id, recalculada tras cambios. Requiere el lock."""
+        if self._order_version != self._version:
+            users = list(self._users.values())
+            self._order = (users, {u["id"]: i for i, u in enumerate(users)})
+            self._order_version = self._version
+        return self._order
+
+    def data_version(self) -> str:
+        """
+        Version de los datos derivada del contenido (numero de usuarios y XOR
+        de un hash por usuario): no depende del historial, asi que sobrevive
+        a compactaciones y reinicios y coincide entre procesos con los mismos
+        datos. Se calcula entera una vez y despues se actualiza con cada cambio.
+        """
+        with self._lock:
+            if self._digest is None:
+                digest = 0
+                for user in self._users.values():
+                    digest ^= _user_digest(user)
+                self._digest = digest
+            return f"{len(self._users):x}-{self._digest:016x}"
+
+    def get_by_id(self, user_id: str) -> Optional[Dict]:
+        return self._users.get(user_id)
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        return self._by_email.get(email)
+
+    def insert(self, user: Dict) -> Dict:
+        with self._lock:
+            if user.get("email") in self._by_email:
+                raise UserConflictError(f"Ya existe un usuario con email {user['email']}")
+            pending = self._write({"op": "put", "user": user})
+        self._finish(*pending)
+        return user
+
+    def insert_many(self, users: List[Dict]) -> List[Dict]:
+        """Anade varios usuarios al journal con un unico fsync."""
+        if not users:
+            return users
+        with self._lock:
+            emails = [user.get("email") for user in users]
+            if len(set(emails)) != len(emails) or any(email in self._by_email for email in emails):
+                raise UserConflictError("Algun email del lote ya existe")
+            should_compact = False
+            for user in users:
+                seq, compact = self._write({"op": "put", "user": user})
+                should_compact = should_compact or compact
+        self._finish(seq, should_compact)
+        return users
+
+    def update(self, user_id: str, updates: Dict) -> Optional[Dict]:
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is None:
+                return None
+            owner = self._by_email.get(updates.get("email"))
+            if owner is not None and owner["id"] != user_id:
+                raise UserConflictError(f"Ya existe un usuario con email {updates['email']}")
+            user = dict(current, **updates)
+            pending = self._write({"op": "put", "user": user})
+        self._finish(*pending)
+        return user
+
+    def delete(self, user_id: str) -> bool:
+        with self._lock:
+            if user_id not in self._users:
+                return False
+            pending = self._write({"op": "del", "id": user_id})
+        self._finish(*pending)
+        return True
+
+
+def _user_digest(user: Dict) -> int:
+    data = json.dumps(user, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
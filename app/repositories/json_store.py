@@ -0,0 +1,224 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # sin fcntl (Windows) solo se serializan los hilos del proceso
+    fcntl = None
+
+from .errors import UserConflictError
+
+
+class _UserSnapshot:
+    """Usuarios ya parseados con indices por id y por email."""
+
+    def __init__(self, users: List[Dict], stamp: Optional[tuple]):
+        self.users = users
+        self.stamp = stamp
+        self.by_id = {u["id"]: u for u in users}
+        self.by_email = {u.get("email"): u for u in users}
+        self.position = {u["id"]: i for i, u in enumerate(users)}
+
+
+class JsonUserStore:
+    """
+    Usuarios en un unico archivo JSON, compartible por varios procesos.
+
+    Mantiene en memoria el contenido parseado y solo vuelve a leer el archivo
+    si cambian su inodo, mtime o tamano; las lecturas no toman ningun lock
+    (ni siquiera el de hilos del proceso), asi que no esperan a una escritura
+    en curso: hasta el rename siguen viendo el snapshot anterior.
+    Cada escritura se hace con un lock exclusivo (`fcntl.flock` sobre
+    `<path>.lock`): relee el archivo si otro proceso lo cambio, aplica el
+    cambio y lo confirma escribiendo un temporal con fsync y renombrandolo
+    encima. Quien lee ve siempre el archivo anterior o el nuevo completos.
+    """
+
+    def __init__(self, path: Path, seed: List[Dict]):
+        self.path = Path(path)
+        self.seed = seed
+        self._snapshot: Optional[_UserSnapshot] = None
+        self._lock = threading.RLock()
+        # Lock entre procesos: descriptor por pid (no se comparte tras fork) y anidamiento
+        self._lock_file = None
+        self._lock_pid = None
+        self._lock_depth = 0
+
+    @property
+    def lock_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".lock")
+
+    @contextmanager
+    def _exclusive(self):
+        """Lock exclusivo del archivo para este hilo y frente a otros procesos."""
+        with self._lock:
+            if fcntl is None or self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            if self._lock_pid != os.getpid():
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._lock_file = open(self.lock_path, "a+b")
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _file_stamp(self) -> Optional[tuple]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        # Cada escritura crea un inodo nuevo (rename), asi que dos versiones
+        # con el mismo mtime y tamano tampoco se confunden
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _parse(self) -> Optional[List[Dict]]:
+        """Contenido del archivo; None si falta, esta vacio o no es JSON valido."""
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                content = f.read().strip()
+            return json.loads(content) if content else None
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _read_users(self) -> List[Dict]:
+        """Lee el archivo JSON de usuarios y devuelve datos o semilla si falta/errores."""
+        users = self._parse()
+        if users is not None:
+            return users
+        with self._exclusive():
+            # Otro proceso puede haberlo escrito mientras se esperaba el lock
+            users = self._parse()
+            if users is None:
+                users = list(self.seed)
+                self._save(users)
+            return users
+
+    def _current(self) -> _UserSnapshot:
+        """
+        Devuelve los usuarios en memoria, recargando solo si el archivo cambio.
+        Sin lock: cada snapshot lleva el stamp de antes de leerlo, asi que si
+        se instala uno ya superado la siguiente consulta lo vuelve a leer.
+        """
+        snapshot = self._snapshot
+        stamp = self._file_stamp()
+        if snapshot is not None and snapshot.stamp == stamp:
+            return snapshot
+        fresh = _UserSnapshot(self._read_users(), stamp)
+        if self._snapshot is snapshot:
+            self._snapshot = fresh
+        return fresh
+
+    def _save(self, users: List[Dict]) -> None:
+        """Escribe el archivo completo (temporal + fsync + rename). Requiere `_exclusive`."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(users, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self._snapshot = _UserSnapshot(list(users), self._file_stamp())
+        self._fsync_dir()
+
+    def _fsync_dir(self) -> None:
+        try:
+            fd = os.open(self.path.parent, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def all_users(self) -> List[Dict]:
+        return list(self._current().users)
+
+    def page(self, limit: int, after: Optional[str] = None) -> Optional[List[Dict]]:
+        """Hasta `limit` usuarios tras el id `after` (None si `after` no existe)."""
+        snapshot = self._current()
+        start = 0
+        if after is not None:
+            if after not in snapshot.position:
+                return None
+            start = snapshot.position[after] + 1
+        return snapshot.users[start:start + limit]
+
+    def data_version(self) -> str:
+        """
+        Version de los datos: inodo, mtime y tamano del archivo. Es la misma
+        en todos los procesos que leen el archivo (cada escritura lo
+        reemplaza con un rename, asi que cambia al menos el inodo).
+        """
+        stamp = self._current().stamp or (0, 0, 0)
+        return ".".join(f"{part:x}" for part in stamp)
+
+    def get_by_id(self, user_id: str) -> Optional[Dict]:
+        return self._current().by_id.get(user_id)
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        return self._current().by_email.get(email)
+
+    def insert(self, user: Dict) -> Dict:
+        with self._exclusive():
+            snapshot = self._current()
+            if user.get("email") in snapshot.by_email:
+                raise UserConflictError(f"Ya existe un usuario con email {user['email']}")
+            self._save(snapshot.users + [user])
+        return user
+
+    def insert_many(self, users: List[Dict]) -> List[Dict]:
+        """Anade varios usuarios con una sola reescritura del archivo (todos o ninguno)."""
+        if not users:
+            return users
+        with self._exclusive():
+            snapshot = self._current()
+            emails = [user.get("email") for user in users]
+            if len(set(emails)) != len(emails) or any(email in snapshot.by_email for email in emails):
+                raise UserConflictError("Algun email del lote ya existe")
+            self._save(snapshot.users + list(users))
+        return users
+
+    def update(self, user_id: str, updates: Dict) -> Optional[Dict]:
+        with self._exclusive():
+            snapshot = self._current()
+            current = snapshot.by_id.get(user_id)
+            if current is None:
+                return None
+            owner = snapshot.by_email.get(updates.get("email"))
+            if owner is not None and owner["id"] != user_id:
+                raise UserConflictError(f"Ya existe un usuario con email {updates['email']}")
+            # Se copia el usuario para no mutar el snapshot compartido
+            user = dict(current, **updates)
+            self._save([user if u["id"] == user_id else u for u in snapshot.users])
+            return user
+
+    def delete(self, user_id: str) -> bool:
+        with self._exclusive():
+            snapshot = self._current()
+            if user_id not in snapshot.by_id:
+                return False
+            self._save([u for u in snapshot.users if u["id"] != user_id])
+            return True
@@ -0,0 +1,279 @@
+"""
+Usuarios en SQLite (modo WAL), compartible entre varios workers de gunicorn.
+
+Migracion desde JSON:
+    python -m app.repositories.sqlite_store data/users.json data/users.db
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .errors import UserConflictError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users(email);
+
+CREATE TABLE IF NOT EXISTS user_favorite_tracks (
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    track_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS user_favorite_tracks_track ON user_favorite_tracks(track_id);
+
+CREATE TABLE IF NOT EXISTS user_favorite_artists (
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    artist_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS user_favorite_artists_artist ON user_favorite_artists(artist_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Sentencias fijas: sqlite3 las prepara una vez y las reutiliza (cached_statements)
+SQL_SELECT_USER = "SELECT id, name, email FROM users WHERE id = ?"
+SQL_SELECT_USER_BY_EMAIL = "SELECT id, name, email FROM users WHERE email = ?"
+SQL_SELECT_USERS = "SELECT id, name, email FROM users ORDER BY seq"
+SQL_SELECT_SEQ = "SELECT seq FROM users WHERE id = ?"
+SQL_SELECT_PAGE = "SELECT id, name, email FROM users WHERE seq > ? ORDER BY seq LIMIT ?"
+SQL_SELECT_TRACKS = "SELECT track_id FROM user_favorite_tracks WHERE user_id = ? ORDER BY position"
+SQL_SELECT_ARTISTS = "SELECT artist_id FROM user_favorite_artists WHERE user_id = ? ORDER BY position"
+SQL_SELECT_ALL_TRACKS = "SELECT user_id, track_id FROM user_favorite_tracks ORDER BY user_id, position"
+SQL_SELECT_ALL_ARTISTS = "SELECT user_id, artist_id FROM user_favorite_artists ORDER BY user_id, position"
+SQL_INSERT_USER = "INSERT INTO users (id, name, email) VALUES (?, ?, ?)"
+SQL_UPDATE_USER = "UPDATE users SET name = ?, email = ? WHERE id = ?"
+SQL_DELETE_USER = "DELETE FROM users WHERE id = ?"
+SQL_INSERT_TRACK = "INSERT INTO user_favorite_tracks (user_id, position, track_id) VALUES (?, ?, ?)"
+SQL_INSERT_ARTIST = "INSERT INTO user_favorite_artists (user_id, position, artist_id) VALUES (?, ?, ?)"
+SQL_DELETE_TRACKS = "DELETE FROM user_favorite_tracks WHERE user_id = ?"
+SQL_DELETE_ARTISTS = "DELETE FROM user_favorite_artists WHERE user_id = ?"
+SQL_GET_META = "SELECT value FROM meta WHERE key = ?"
+SQL_SET_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+SQL_INIT_META = "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)"
+SQL_GET_VERSION = "SELECT key, value FROM meta WHERE key IN ('epoch', 'version')"
+# Contador de cambios compartido por todos los procesos (base de los ETag)
+SQL_BUMP_VERSION = (
+    "INSERT INTO meta (key, value) VALUES ('version', 1) "
+    "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+)
+
+
+class SqliteUserStore:
+    """
+    Usuarios en SQLite con WAL: lecturas concurrentes entre procesos y un
+    unico escritor a la vez. Cada hilo reutiliza su propia conexion.
+    Los favoritos viven en tablas aparte para poder consultarlos.
+    """
+
+    def __init__(self, db_path: Path, seed: List[Dict], json_path: Optional[Path] = None):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute(SQL_GET_META, ("initialized",)).fetchone() is None:
+                # Primera vez: se importa el JSON existente o la semilla
+                users = _read_json_users(json_path) if json_path else None
+                _insert_users(conn, users if users is not None else seed)
+                conn.execute(SQL_SET_META, ("initialized", "1"))
+            # Identificador de esta base: si se recrea, el contador de versiones no se confunde
+            conn.execute(SQL_INIT_META, ("epoch", uuid.uuid4().hex[:12]))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def _hydrate(self, conn, row) -> Dict:
+        user_id = row[0]
+        return {
+            "id": user_id,
+            "name": row[1],
+            "email": row[2],
+            "favorite_tracks": [r[0] for r in conn.execute(SQL_SELECT_TRACKS, (user_id,))],
+            "favorite_artists": [r[0] for r in conn.execute(SQL_SELECT_ARTISTS, (user_id,))],
+        }
+
+    def all_users(self) -> List[Dict]:
+        conn = self._conn()
+        # Una transaccion de lectura para ver un estado consistente
+        with conn:
+            conn.execute("BEGIN")
+            users = [
+                {"id": r[0], "name": r[1], "email": r[2], "favorite_tracks": [], "favorite_artists": []}
+                for r in conn.execute(SQL_SELECT_USERS)
+            ]
+            by_id = {u["id"]: u for u in users}
+            for user_id, track_id in conn.execute(SQL_SELECT_ALL_TRACKS):
+                by_id[user_id]["favorite_tracks"].append(track_id)
+            for user_id, artist_id in conn.execute(SQL_SELECT_ALL_ARTISTS):
+                by_id[user_id]["favorite_artists"].append(artist_id)
+        return users
+
+    def page(self, limit: int, after: Optional[str] = None) -> Optional[List[Dict]]:
+        """Hasta `limit` usuarios tras el id `after` (None si `after` no existe)."""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            last_seq = 0
+            if after is not None:
+                row = conn.execute(SQL_SELECT_SEQ, (after,)).fetchone()
+                if row is None:
+                    return None
+                last_seq = row[0]
+            rows = conn.execute(SQL_SELECT_PAGE, (last_seq, limit)).fetchall()
+            return [self._hydrate(conn, row) for row in rows]
+
+    def get_by_id(self, user_id: str) -> Optional[Dict]:
+        conn = self._conn()
+        row = conn.execute(SQL_SELECT_USER, (user_id,)).fetchone()
+        return self._hydrate(conn, row) if row else None
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        conn = self._conn()
+        row = conn.execute(SQL_SELECT_USER_BY_EMAIL, (email,)).fetchone()
+        return self._hydrate(conn, row) if row else None
+
+    def insert(self, user: Dict) -> Dict:
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                _insert_users(conn, [user])
+                conn.execute(SQL_BUMP_VERSION)
+        except sqlite3.IntegrityError as e:
+            raise UserConflictError(f"Ya existe un usuario con email {user['email']}") from e
+        return user
+
+    def insert_many(self, users: List[Dict]) -> List[Dict]:
+        """Anade varios usuarios en una sola transaccion (todos o ninguno)."""
+        if not users:
+            return users
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                _insert_users(conn, users)
+                conn.execute(SQL_BUMP_VERSION)
+        except sqlite3.IntegrityError as e:
+            raise UserConflictError("Algun email del lote ya existe") from e
+        return users
+
+    def update(self, user_id: str, updates: Dict) -> Optional[Dict]:
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(SQL_SELECT_USER, (user_id,)).fetchone()
+                if row is None:
+                    return None
+                user = dict(self._hydrate(conn, row), **updates)
+                conn.execute(SQL_UPDATE_USER, (user["name"], user["email"], user_id))
+                if "favorite_tracks" in updates:
+                    conn.execute(SQL_DELETE_TRACKS, (user_id,))
+                    conn.executemany(SQL_INSERT_TRACK, _positions(user_id, user["favorite_tracks"]))
+                if "favorite_artists" in updates:
+                    conn.execute(SQL_DELETE_ARTISTS, (user_id,))
+                    conn.executemany(SQL_INSERT_ARTIST, _positions(user_id, user["favorite_artists"]))
+                conn.execute(SQL_BUMP_VERSION)
+        except sqlite3.IntegrityError as e:
+            raise UserConflictError(f"Ya existe un usuario con email {updates.get('email')}") from e
+        return user
+
+    def delete(self, user_id: str) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(SQL_DELETE_USER, (user_id,))
+            if cur.rowcount > 0:
+                conn.execute(SQL_BUMP_VERSION)
+        return cur.rowcount > 0
+
+    def data_version(self) -> str:
+        """
+        Version de los datos: identificador de la base y contador de
+        escrituras; cambia con cada escritura de cualquier proceso.
+        """
+        meta = dict(self._conn().execute(SQL_GET_VERSION).fetchall())
+        return f"{meta.get('epoch', '')}.{meta.get('version', 0)}"
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    # isolation_level=None: las transacciones se abren explicitamente con BEGIN
+    conn = sqlite3.connect(str(db_path), timeout=5.0, isolation_level=None, cached_statements=256)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def _positions(user_id: str, ids: Iterable[str]):
+    return [(user_id, position, item_id) for position, item_id in enumerate(ids)]
+
+
+def _insert_users(conn: sqlite3.Connection, users: Iterable[Dict]) -> None:
+    for user in users:
+        conn.execute(SQL_INSERT_USER, (user["id"], user["name"], user["email"]))
+        conn.executemany(SQL_INSERT_TRACK, _positions(user["id"], user.get("favorite_tracks", [])))
+        conn.executemany(SQL_INSERT_ARTIST, _positions(user["id"], user.get("favorite_artists", [])))
+
+
+def _read_json_users(json_path: Path) -> Optional[List[Dict]]:
+    try:
+        with Path(json_path).open("r", encoding="utf-8") as f:
+            content = f.read().strip()
+        return json.loads(content) if content else None
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def migrate_from_json(json_path: Path, db_path: Path) -> int:
+    """Copia todos los usuarios de un users.json a una base SQLite nueva o vacia."""
+    users = _read_json_users(json_path)
+    if users is None:
+        raise ValueError(f"No se pudieron leer usuarios de {json_path}")
+    conn = connect(Path(db_path))
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+                raise ValueError(f"{db_path} ya contiene usuarios")
+            _insert_users(conn, users)
+            conn.execute(SQL_SET_META, ("initialized", "1"))
+    finally:
+        conn.close()
+    return len(users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra users.json a SQLite")
+    parser.add_argument("json_path")
+    parser.add_argument("db_path")
+    args = parser.parse_args()
+    count = migrate_from_json(args.json_path, args.db_path)
+    print(f"{count} usuarios migrados a {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
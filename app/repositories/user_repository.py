@@ -1,9 +1,15 @@
-import json
+import logging
+import threading
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from flask import current_app
 
+from .favorites_index import FavoritesIndex
+from .journal_store import JournalUserStore
+from .json_store import JsonUserStore
+from .sqlite_store import SqliteUserStore
+
 DATA_FILE_DEFAULT = Path(__file__).resolve().parents[2] / "data" / "users.json"
 
 # Datos de ejemplo por si el archivo no existe o es ilegible
@@ -49,70 +55,220 @@ def _data_file() -> Path:
     return DATA_FILE_DEFAULT
 
 
-def _load_users() -> List[Dict]:
-    """Lee el archivo JSON de usuarios y devuelve datos o semilla si falta/errores."""
-    data_file = _data_file()
-    if not data_file.exists():
-        _save_users(DEFAULT_USERS)
-        return list(DEFAULT_USERS)
+# (backend, ruta) -> store; un unico store por proceso para cada archivo
+_stores: Dict[tuple, object] = {}
+_stores_lock = threading.Lock()
+
 
+def _config(name: str, default):
     try:
-        with data_file.open("r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:
-                _save_users(DEFAULT_USERS)
-                return list(DEFAULT_USERS)
-            return json.loads(content)
-    except json.JSONDecodeError:
-        _save_users(DEFAULT_USERS)
-        return list(DEFAULT_USERS)
-
-
-def _save_users(users: List[Dict]) -> None:
+        return current_app.config.get(name, default)
+    except Exception:
+        return default
+
+
+def _store():
+    """Devuelve el motor de almacenamiento configurado en USERS_BACKEND."""
+    backend = _config("USERS_BACKEND", "json")
     data_file = _data_file()
-    data_file.parent.mkdir(parents=True, exist_ok=True)
-    with data_file.open("w", encoding="utf-8") as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+    sqlite_path = _config("USERS_SQLITE_PATH", None) or data_file.with_suffix(".db")
+    key = (backend, sqlite_path if backend == "sqlite" else data_file)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is not None:
+            return store
+        if backend == "json":
+            store = JsonUserStore(data_file, DEFAULT_USERS)
+        elif backend == "journal":
+            store = JournalUserStore(
+                data_file,
+                DEFAULT_USERS,
+                compact_every=_config("USERS_JOURNAL_COMPACT_EVERY", 1000),
+                group_commit_ms=_config("USERS_JOURNAL_GROUP_COMMIT_MS", 0),
+            )
+        elif backend == "sqlite":
+            store = SqliteUserStore(Path(sqlite_path), DEFAULT_USERS, json_path=data_file)
+        else:
+            raise ValueError(f"USERS_BACKEND desconocido: {backend}")
+        _stores[key] = store
+        return store
+
+
+# store -> indice invertido de favoritos (se construye en la primera consulta)
+_indexes: Dict[int, FavoritesIndex] = {}
+
+
+def _index() -> FavoritesIndex:
+    """
+    Indice de favoritos al dia con el store. Las escrituras de este proceso
+    lo actualizan de forma incremental; si la version del store no coincide
+    (recarga del JSON, escrituras de otro proceso) se reconstruye entero.
+    """
+    store = _store()
+    with _stores_lock:
+        index = _indexes.setdefault(id(store), FavoritesIndex())
+    with index._lock:
+        version = store.data_version()
+        if index.version != version:
+            index.rebuild(_iter_pages(store, None, 500), version)
+    return index
+
+
+def _write(write, reindex):
+    """
+    Ejecuta `write(store)` y aplica `reindex(indice, resultado)` si el indice
+    ya existe. La escritura va fuera del lock del indice (no serializa el
+    fsync agrupado del journal); si la version del store no era la del
+    indice antes de escribir (otro proceso, escrituras concurrentes), el
+    indice queda marcado para reconstruirse en la siguiente consulta.
+    """
+    store = _store()
+    index = _indexes.get(id(store))
+    if index is None:
+        return write(store)
+    before = store.data_version()
+    result = write(store)
+    with index._lock:
+        reindex(index, result)
+        index.version = store.data_version() if index.version == before else None
+    return result
+
+
+# Funciones listener(evento, usuario) avisadas tras create/update/delete
+_listeners: List[Callable[[str, Dict], None]] = []
+
+logger = logging.getLogger(__name__)
+
+
+def add_listener(listener: Callable[[str, Dict], None]) -> None:
+    """Registra `listener(evento, usuario)`; evento es "create", "update" o "delete"."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[str, Dict], None]) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _notify(event: str, user: Dict) -> None:
+    # Un listener que falla no debe romper la escritura ya hecha
+    for listener in list(_listeners):
+        try:
+            listener(event, user)
+        except Exception:
+            logger.exception("Fallo en listener de usuarios (%s)", event)
 
 
 def get_all_users() -> List[Dict]:
-    return _load_users()
+    return _store().all_users()
+
+
+def get_users_page(limit: int, after: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Pagina por cursor: devuelve hasta `limit` usuarios posteriores al id
+    `after` y el id a usar como siguiente cursor (None si no hay mas).
+    Lanza KeyError si `after` no corresponde a ningun usuario.
+    """
+    users = _store().page(limit + 1, after)
+    if users is None:
+        raise KeyError(after)
+    if len(users) > limit:
+        users = users[:limit]
+        return users, users[-1]["id"]
+    return users, None
+
+
+def iter_users(after: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict]:
+    """Recorre los usuarios por lotes sin construir la lista completa."""
+    return _iter_pages(_store(), after, batch_size)
+
+
+def _iter_pages(store, after: Optional[str], batch_size: int) -> Iterator[Dict]:
+    while True:
+        users = store.page(batch_size, after)
+        if users is None:
+            raise KeyError(after)
+        yield from users
+        if len(users) < batch_size:
+            return
+        after = users[-1]["id"]
+
+
+def data_version() -> str:
+    """
+    Contador de version de los usuarios (base de los ETag). Lo lleva el
+    motor de almacenamiento para que tambien cambie con escrituras hechas
+    por otros procesos sobre el mismo archivo o base de datos.
+    """
+    return _store().data_version()
 
 
 def get_user_by_id(user_id: str) -> Optional[Dict]:
-    return next((u for u in _load_users() if u["id"] == user_id), None)
+    return _store().get_by_id(user_id)
 
 
-def create_user(data: Dict) -> Dict:
-    users = _load_users()
-    user = {
+def get_user_by_email(email: str) -> Optional[Dict]:
+    return _store().get_by_email(email)
+
+
+def _new_user(data: Dict) -> Dict:
+    return {
         "id": str(uuid.uuid4()),
         "name": data["name"],
         "email": data["email"],
         "favorite_tracks": data.get("favorite_tracks", []),
         "favorite_artists": data.get("favorite_artists", []),
     }
-    users.append(user)
-    _save_users(users)
+
+
+def create_user(data: Dict) -> Dict:
+    user = _write(lambda store: store.insert(_new_user(data)), lambda index, user: index.add(user))
+    _notify("create", user)
     return user
 
 
+def create_users(items: List[Dict]) -> List[Dict]:
+    """
+    Crea varios usuarios con una sola escritura en el almacenamiento
+    (una reescritura del JSON, un fsync del journal, una transaccion SQLite).
+    """
+    users = _write(
+        lambda store: store.insert_many([_new_user(data) for data in items]),
+        lambda index, users: [index.add(user) for user in users],
+    )
+    for user in users:
+        _notify("create", user)
+    return users
+
+
 def update_user(user_id: str, updates: Dict) -> Optional[Dict]:
-    users = _load_users()
-    for u in users:
-        if u["id"] == user_id:
-            for key in ("name", "email", "favorite_tracks", "favorite_artists"):
-                if key in updates:
-                    u[key] = updates[key]
-            _save_users(users)
-            return u
-    return None
+    allowed = {
+        key: updates[key]
+        for key in ("name", "email", "favorite_tracks", "favorite_artists")
+        if key in updates
+    }
+    user = _write(
+        lambda store: store.update(user_id, allowed),
+        lambda index, user: user is not None and index.add(user),
+    )
+    if user is not None:
+        _notify("update", user)
+    return user
 
 
 def delete_user(user_id: str) -> bool:
-    users = _load_users()
-    filtered = [u for u in users if u["id"] != user_id]
-    if len(filtered) == len(users):
-        return False
-    _save_users(filtered)
-    return True
+    deleted = _write(lambda store: store.delete(user_id), lambda index, deleted: index.remove(user_id))
+    if deleted:
+        _notify("delete", {"id": user_id})
+    return deleted
+
+
+def get_users_with_favorite(kind: str, item_id: str, limit: Optional[int] = None) -> Tuple[int, List[str]]:
+    """(total, ids) de los usuarios con `item_id` en sus favoritos `kind` ("tracks" o "artists")."""
+    return _index().users_with(kind, item_id, limit)
+
+
+def get_similar_users(user_id: str, k: int = 10, metric: str = "jaccard",
+                      kinds: Tuple[str, ...] = ("tracks", "artists")) -> Optional[List[Dict]]:
+    """Top-k usuarios con gustos mas parecidos; None si el usuario no existe."""
+    return _index().similar(user_id, k, metric, kinds)
@@ -0,0 +1,27 @@
+from marshmallow import ValidationError, fields
+
+
+class FieldList(fields.String):
+    """
+    Parametro `fields` (sparse fieldsets): nombres separados por comas.
+    Se deserializa a una tupla en el orden del esquema; None si viene vacio.
+    """
+
+    def __init__(self, allowed, **kwargs):
+        self.allowed = tuple(allowed)
+        kwargs.setdefault(
+            "description",
+            "Campos a devolver separados por comas (p. ej. id,name); por defecto todos. "
+            f"Disponibles: {', '.join(self.allowed)}",
+        )
+        super().__init__(data_key="fields", **kwargs)
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        raw = super()._deserialize(value, attr, data, **kwargs)
+        requested = {name.strip() for name in raw.split(",") if name.strip()}
+        unknown = requested.difference(self.allowed)
+        if unknown:
+            raise ValidationError(f"Campos desconocidos: {', '.join(sorted(unknown))}")
+        if not requested:
+            return None
+        return tuple(name for name in self.allowed if name in requested)
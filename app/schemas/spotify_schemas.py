@@ -1,4 +1,11 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
+
+from ..models import ALBUM_FIELDS, ARTIST_FIELDS, TRACK_FIELDS, Track
+from .common_schemas import FieldList
+
+# Campos de los items de busqueda (el conjunto valido depende de `type`)
+SEARCH_FIELDS = tuple(dict.fromkeys(Track.SUMMARY_FIELDS + ALBUM_FIELDS + ARTIST_FIELDS))
+FAVORITES_FIELDS = tuple(dict.fromkeys(Track.SUMMARY_FIELDS + ARTIST_FIELDS))
 
 
 class SearchQuerySchema(Schema):
@@ -15,6 +22,33 @@ class SearchQuerySchema(Schema):
         load_default="ES",
         description="Codigo de pais (ej. ES)"
     )
+    source = fields.String(
+        load_default="auto",
+        validate=validate.OneOf(["auto", "upstream", "local"]),
+        description="upstream: solo Spotify; local: solo el indice de lo ya cacheado; "
+                    "auto: Spotify y, si falla o limita, el indice local"
+    )
+    fields_ = FieldList(SEARCH_FIELDS)
+
+
+class TrackQuerySchema(Schema):
+    fields_ = FieldList(TRACK_FIELDS)
+
+
+class AlbumQuerySchema(Schema):
+    fields_ = FieldList(ALBUM_FIELDS)
+
+
+class ArtistQuerySchema(Schema):
+    fields_ = FieldList(ARTIST_FIELDS)
+
+
+class FavoritesQuerySchema(Schema):
+    fields_ = FieldList(
+        FAVORITES_FIELDS,
+        description="Campos de cada cancion/artista separados por comas (p. ej. id,name); "
+        f"por defecto todos. Disponibles: {', '.join(FAVORITES_FIELDS)}",
+    )
 
 
 class TrackSchema(Schema):
@@ -49,9 +83,18 @@ class SearchResultSchema(Schema):
     items = fields.List(fields.Raw())
 
 
+class PartialErrorSchema(Schema):
+    source = fields.String(description="Parte de la respuesta que no se pudo obtener")
+    message = fields.String()
+
+
 class FavoritesDetailSchema(Schema):
     tracks = fields.List(fields.Nested(TrackSchema))
     artists = fields.List(fields.Nested(ArtistSchema))
+    errors = fields.List(
+        fields.Nested(PartialErrorSchema),
+        description="Fallos parciales; el resto de la respuesta es valida"
+    )
 
 
 class FullTrackSchema(Schema):
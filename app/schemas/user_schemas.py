@@ -1,4 +1,8 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
+
+from .common_schemas import FieldList
+
+USER_FIELDS = ("id", "name", "email", "favorite_tracks", "favorite_artists")
 
 
 class UserSchema(Schema):
@@ -29,3 +33,82 @@ class UserUpdateSchema(Schema):
     email = fields.Email()
     favorite_tracks = fields.List(fields.String())
     favorite_artists = fields.List(fields.String())
+
+
+class UserListQuerySchema(Schema):
+    limit = fields.Integer(
+        validate=validate.Range(min=1, max=1000),
+        description="Tamano de pagina; sin limit se devuelven todos los usuarios"
+    )
+    after = fields.String(
+        description="Cursor opaco devuelto en X-Next-Cursor por la pagina anterior"
+    )
+    stream = fields.String(
+        validate=validate.OneOf(["ndjson", "array"]),
+        description="Respuesta en streaming: ndjson (una linea por usuario) o array JSON por trozos"
+    )
+    fields_ = FieldList(USER_FIELDS)
+
+
+class UserQuerySchema(Schema):
+    fields_ = FieldList(USER_FIELDS)
+
+
+class UserBulkCreatedSchema(Schema):
+    line = fields.Integer(required=True, description="Linea del NDJSON (desde 1)")
+    id = fields.String(required=True)
+
+
+class UserBulkErrorSchema(Schema):
+    line = fields.Integer(required=True, description="Linea del NDJSON (desde 1)")
+    errors = fields.Dict(
+        keys=fields.String(),
+        values=fields.List(fields.String()),
+        description="Errores por campo, como en la validacion de POST /v1/users"
+    )
+
+
+class UserBulkResultSchema(Schema):
+    created = fields.List(fields.Nested(UserBulkCreatedSchema))
+    errors = fields.List(fields.Nested(UserBulkErrorSchema))
+
+
+class AudienceQuerySchema(Schema):
+    limit = fields.Integer(
+        load_default=100,
+        validate=validate.Range(min=1, max=10000),
+        description="Maximo de ids de usuario a devolver (count es siempre el total)"
+    )
+
+
+class AudienceSchema(Schema):
+    id = fields.String(required=True, description="ID de Spotify consultado")
+    count = fields.Integer(required=True, description="Usuarios que lo tienen en favoritos")
+    user_ids = fields.List(fields.String())
+
+
+class SimilarQuerySchema(Schema):
+    k = fields.Integer(load_default=10, validate=validate.Range(min=1, max=100))
+    metric = fields.String(
+        load_default="jaccard",
+        validate=validate.OneOf(["jaccard", "cosine"]),
+        description="Similitud entre conjuntos de favoritos"
+    )
+    by = fields.String(
+        load_default="all",
+        validate=validate.OneOf(["all", "tracks", "artists"]),
+        description="Favoritos que se comparan"
+    )
+
+
+class SimilarUserSchema(Schema):
+    id = fields.String(required=True)
+    score = fields.Float(required=True)
+    shared = fields.Integer(required=True, description="Favoritos en comun")
+
+
+class SimilarUsersSchema(Schema):
+    user_id = fields.String(required=True)
+    metric = fields.String(required=True)
+    by = fields.String(required=True)
+    results = fields.List(fields.Nested(SimilarUserSchema))
@@ -0,0 +1,39 @@
+"""
+Serializacion rapida de respuestas JSON.
+
+Los handlers de lectura construyen ya el dict final con las funciones de
+mapeo (o lo devuelve el repositorio), asi que volver a pasarlo por
+marshmallow solo cuesta CPU. Con FAST_SERIALIZATION activo, `fast_response`
+codifica ese dict directamente (orjson si esta instalado, si no json) y
+devuelve un Response ya hecho, que flask-smorest deja pasar sin volver a
+serializar. El esquema de `@blp.response` sigue documentando la respuesta.
+"""
+import json
+
+from flask import Response, current_app
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+
+def dumps(data):
+    """Codifica `data` a JSON (bytes UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_enabled():
+    return current_app.config.get("FAST_SERIALIZATION", False)
+
+
+def fast_response(data, status=200, headers=None):
+    """
+    Respuesta para un dict/lista de confianza (ya proyectado a los campos del
+    esquema). Sin FAST_SERIALIZATION se devuelve tal cual para marshmallow.
+    """
+    if not fast_enabled():
+        return data, status, headers or {}
+    return Response(dumps(data), status=status, headers=headers, mimetype="application/json")
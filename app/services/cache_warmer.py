@@ -0,0 +1,188 @@
+"""
+Precalentado de la cache de metadatos con los favoritos de todos los usuarios.
+
+Un hilo en segundo plano recorre el repositorio, junta los ids de
+`favorite_tracks` y `favorite_artists` y los pide a Spotify en lotes
+multi-id, a un ritmo limitado y con prioridad BACKGROUND en el planificador:
+primero lo que no esta en cache y despues lo que caduca antes. Los cambios
+de usuarios (create/update) se atienden entre lote y lote.
+"""
+import logging
+import threading
+import time
+
+from ..repositories import user_repository as repo
+from .rate_limiter import mark_background_thread
+from .spotify_service import MAX_IDS_PER_REQUEST, SpotifyService
+
+logger = logging.getLogger(__name__)
+
+# Tipo de entidad -> campo de favoritos del usuario
+FAVORITE_FIELDS = {"track": "favorite_tracks", "artist": "favorite_artists"}
+
+
+class CacheWarmer:
+    def __init__(self, app, interval=300, rate=1.0, refresh_ahead=600, batch_size=MAX_IDS_PER_REQUEST):
+        self.app = app
+        self.interval = interval
+        self.rate = rate
+        self.refresh_ahead = refresh_ahead
+        self.batch_size = min(batch_size, MAX_IDS_PER_REQUEST)
+
+        self._pending = {kind: set() for kind in FAVORITE_FIELDS}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.passes = 0
+        self.batches = 0
+        self.warmed = 0
+        self.refreshed = 0
+        self.errors = 0
+
+    # -- ciclo de vida ----------------------------------------------------
+
+    def start(self):
+        repo.add_listener(self.on_user_change)
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        repo.remove_listener(self.on_user_change)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def on_user_change(self, event, user):
+        """Listener del repositorio: encola los favoritos nuevos o cambiados."""
+        if event not in ("create", "update"):
+            return
+        with self._lock:
+            for kind, field in FAVORITE_FIELDS.items():
+                self._pending[kind].update(user.get(field) or ())
+        self._wake.set()
+
+    def _run(self):
+        mark_background_thread()
+        next_pass = 0.0
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    if time.monotonic() >= next_pass:
+                        self.warm_once()
+                        next_pass = time.monotonic() + self.interval
+                    else:
+                        # Despertado por un cambio de usuario: solo lo pendiente
+                        self._drain_pending(SpotifyService())
+            except Exception:
+                self.errors += 1
+                logger.exception("Fallo en el precalentado de la cache")
+            self._wake.wait(max(0.0, next_pass - time.monotonic()))
+            self._wake.clear()
+
+    # -- trabajo ----------------------------------------------------------
+
+    def _favorites(self):
+        wanted = {kind: set() for kind in FAVORITE_FIELDS}
+        for user in repo.iter_users():
+            for kind, field in FAVORITE_FIELDS.items():
+                wanted[kind].update(user.get(field) or ())
+        return wanted
+
+    def _plan(self, service):
+        """
+        Lotes (kind, ids, refrescar) de una pasada: primero los ids que no
+        estan en memoria, despues los que caducan dentro de `refresh_ahead`
+        segundos, de antes a despues.
+        """
+        missing, expiring = [], []
+        horizon = time.time() + self.refresh_ahead
+        for kind, ids in self._favorites().items():
+            expiry = service.cache.expiry_many(kind, ids)
+            absent = sorted(key for key in ids if key not in expiry)
+            missing.extend(self._batches(kind, absent, refresh=False))
+            soon = sorted((expires_at, key) for key, expires_at in expiry.items() if expires_at < horizon)
+            for start in range(0, len(soon), self.batch_size):
+                chunk = soon[start:start + self.batch_size]
+                expiring.append((chunk[0][0], kind, [key for _, key in chunk]))
+        expiring.sort(key=lambda batch: batch[0])
+        return missing + [(kind, ids, True) for _, kind, ids in expiring]
+
+    def _batches(self, kind, ids, refresh):
+        return [
+            (kind, ids[start:start + self.batch_size], refresh)
+            for start in range(0, len(ids), self.batch_size)
+        ]
+
+    def _take_pending(self):
+        with self._lock:
+            batches = []
+            for kind, ids in self._pending.items():
+                batches.extend(self._batches(kind, sorted(ids), refresh=False))
+                ids.clear()
+            return batches
+
+    def _fetch(self, service, kind, ids, refresh):
+        try:
+            if refresh:
+                self.refreshed += len(service.refresh_several(kind, ids))
+            else:
+                # Memoria -> disco -> Spotify; solo se piden (y se cuentan) los que faltan
+                cached = service.cache.expiry_many(kind, ids)
+                absent = [key for key in ids if key not in cached]
+                getattr(service, f"get_several_{kind}s")(ids)
+                self.warmed += len(service.cache.expiry_many(kind, absent))
+        except Exception:
+            self.errors += 1
+            logger.exception("Fallo al precalentar %d %ss", len(ids), kind)
+        self.batches += 1
+
+    def _pace(self):
+        """Presupuesto de ritmo: como maximo `rate` lotes por segundo. True si hay que parar."""
+        return self._stop.wait(1.0 / self.rate if self.rate > 0 else 0)
+
+    def _drain_pending(self, service):
+        for kind, ids, refresh in self._take_pending():
+            self._fetch(service, kind, ids, refresh)
+            if self._pace():
+                return
+
+    def warm_once(self):
+        """Una pasada completa; los cambios de usuarios se atienden entre lotes."""
+        service = SpotifyService()
+        for kind, ids, refresh in self._plan(service):
+            self._drain_pending(service)
+            if self._stop.is_set():
+                return
+            self._fetch(service, kind, ids, refresh)
+            if self._pace():
+                return
+        self._drain_pending(service)
+        self.passes += 1
+
+    def stats(self):
+        return {
+            "passes": self.passes,
+            "batches": self.batches,
+            "warmed": self.warmed,
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+        }
+
+
+def start_cache_warmer(app):
+    """Arranca el precalentado para `app` (una vez por app) y lo devuelve."""
+    warmer = app.extensions.get("cache_warmer")
+    if warmer is None:
+        warmer = CacheWarmer(
+            app,
+            interval=app.config.get("CACHE_WARMER_INTERVAL", 300),
+            rate=app.config.get("CACHE_WARMER_RATE", 1.0),
+            refresh_ahead=app.config.get("CACHE_WARMER_REFRESH_AHEAD", 600),
+            batch_size=app.config.get("CACHE_WARMER_BATCH_SIZE", MAX_IDS_PER_REQUEST),
+        )
+        app.extensions["cache_warmer"] = warmer
+        warmer.start()
+    return warmer
@@ -0,0 +1,188 @@
+"""
+Disyuntores (circuit breakers) por familia de endpoints de Spotify.
+
+Cuando Spotify falla o va lento, seguir llamando solo acumula hilos
+esperando timeouts. Cada familia (search, tracks, albums, artists) tiene su
+disyuntor:
+
+- closed: pasan todas las llamadas y se anota el resultado de las ultimas
+  `window`. Con al menos `min_calls`, si la proporcion de errores (red o
+  5xx) llega a `error_rate`, o la de llamadas lentas (mas de
+  `slow_call_seconds`) a `slow_rate`, se abre.
+- open: las llamadas fallan al instante con CircuitOpen durante
+  `open_seconds`; quien llama puede servir lo ultimo que tenga en cache.
+- half_open: pasado ese tiempo se dejan pasar `half_open_calls` llamadas de
+  prueba; si todas van bien se cierra y si alguna falla o es lenta se
+  vuelve a abrir.
+
+Un 429 no cuenta ni a favor ni en contra: eso lo gestiona el planificador.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Operaciones de SpotifyService -> familia de endpoints
+FAMILIES = {
+    "search": "search",
+    "get_track": "tracks",
+    "get_several_tracks": "tracks",
+    "get_album": "albums",
+    "get_artist": "artists",
+    "get_several_artists": "artists",
+}
+
+
+class CircuitOpen(Exception):
+    """El disyuntor de la familia esta abierto: no se llama a Spotify."""
+
+    def __init__(self, family, retry_after=1.0):
+        super().__init__(f"Spotify no disponible ({family}); intentalo mas tarde")
+        self.family = family
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, window=20, min_calls=10, error_rate=0.5, slow_call_seconds=2.0,
+                 slow_rate=0.8, open_seconds=30.0, half_open_calls=3):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window)   # (fallo, lenta) de las ultimas llamadas
+        self.state = CLOSED
+        self._opened_until = 0.0
+        self._probes = 0
+        self._probes_ok = 0
+
+        self.opened = 0
+        self.rejected = 0
+
+    def _open(self, now):
+        """Requiere el lock."""
+        self.state = OPEN
+        self._opened_until = now + self.open_seconds
+        self._calls.clear()
+        self.opened += 1
+
+    def before_call(self):
+        """Deja pasar la llamada o lanza CircuitOpen."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now < self._opened_until:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, self._opened_until - now)
+                self.state = HALF_OPEN
+                self._probes = 0
+                self._probes_ok = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, 1.0)
+                self._probes += 1
+
+    def after_call(self, failed, elapsed):
+        """
+        Anota el resultado de una llamada que paso por before_call: `failed`
+        True/False, o None si no dice nada de la salud de Spotify (429,
+        turno no conseguido...).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                if failed is None:
+                    self._probes -= 1
+                elif failed or elapsed >= self.slow_call_seconds:
+                    self._open(now)
+                else:
+                    self._probes_ok += 1
+                    if self._probes_ok >= self.half_open_calls:
+                        self.state = CLOSED
+                return
+            if self.state == OPEN or failed is None:
+                # Respuestas tardias de antes de abrir: ya no cuentan
+                return
+            self._calls.append((failed, elapsed >= self.slow_call_seconds))
+            if len(self._calls) >= self.min_calls:
+                errors = sum(1 for fail, _ in self._calls if fail)
+                slow = sum(1 for _, is_slow in self._calls if is_slow)
+                if errors >= self.error_rate * len(self._calls) or slow >= self.slow_rate * len(self._calls):
+                    self._open(now)
+
+    @contextmanager
+    def guard(self, failures=()):
+        """
+        Llamada a traves del disyuntor. El bloque fija `call["started"]` al
+        enviar y `call["failed"]` segun la respuesta; una excepcion de
+        `failures` cuenta como fallo y si `failed` queda en None no cuenta.
+        """
+        self.before_call()
+        call = {"failed": None, "started": None}
+        try:
+            yield call
+        except failures:
+            call["failed"] = True
+            raise
+        finally:
+            elapsed = time.monotonic() - call["started"] if call["started"] is not None else 0.0
+            self.after_call(call["failed"], elapsed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "family": self.name,
+                "state": self.state,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "recent_calls": len(self._calls),
+            }
+
+
+def unguarded():
+    """Equivalente a `guard()` cuando los disyuntores estan desactivados."""
+    return nullcontext({"failed": None, "started": None})
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_from_config(config, family):
+    """Disyuntor del proceso para `family`; None si SPOTIFY_BREAKER_ENABLED esta desactivado."""
+    if not config.get("SPOTIFY_BREAKER_ENABLED", True):
+        return None
+    key = (
+        family,
+        config.get("SPOTIFY_BREAKER_WINDOW", 20),
+        config.get("SPOTIFY_BREAKER_MIN_CALLS", 10),
+        config.get("SPOTIFY_BREAKER_ERROR_RATE", 0.5),
+        config.get("SPOTIFY_BREAKER_SLOW_CALL_SECONDS", 2.0),
+        config.get("SPOTIFY_BREAKER_SLOW_RATE", 0.8),
+        config.get("SPOTIFY_BREAKER_OPEN_SECONDS", 30.0),
+        config.get("SPOTIFY_BREAKER_HALF_OPEN_CALLS", 3),
+    )
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                family, window=key[1], min_calls=key[2], error_rate=key[3], slow_call_seconds=key[4],
+                slow_rate=key[5], open_seconds=key[6], half_open_calls=key[7],
+            )
+            _breakers[key] = breaker
+        return breaker
+
+
+def all_breakers():
+    """Todos los disyuntores creados en el proceso."""
+    with _breakers_lock:
+        return list(_breakers.values())
@@ -0,0 +1,134 @@
+import threading
+
+from .metadata_cache import MetadataCache
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Agrupa llamadas identicas en vuelo: solo la primera ejecuta la funcion."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Devuelve (resultado, compartido) donde `compartido` indica si se reutilizo otra llamada."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+# Operadores de la sintaxis de busqueda de Spotify: solo cuentan en mayusculas
+SEARCH_OPERATORS = frozenset(("AND", "OR", "NOT"))
+
+
+def normalize_search_key(q, type_, limit, market):
+    """
+    Clave de busqueda: q en minusculas (casefold) y con espacios colapsados,
+    salvo los operadores AND/OR/NOT, que cambian el significado. Solo sirve
+    para agrupar y cachear: a Spotify se le envia la q original.
+    """
+    words = [word if word in SEARCH_OPERATORS else word.casefold() for word in q.split()]
+    return (" ".join(words), type_, int(limit), (market or "").upper())
+
+
+class SearchCoalescer:
+    """
+    Busquedas de Spotify con agrupacion de llamadas en vuelo y cache de TTL
+    corto sobre la clave normalizada.
+    """
+
+    def __init__(self, ttl=60, max_entries=2000):
+        self._flight = SingleFlight()
+        self._cache = MetadataCache(
+            max_entries=max_entries, ttls={"search": ttl}, stale_ttl=0, content_hash=False
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+
+    def search(self, key, fetch):
+        """Devuelve el resultado para `key`, llamando a `fetch()` solo si hace falta."""
+        with self._lock:
+            self.requests += 1
+
+        cached = self._cache.get("search", key)
+        if cached is not None:
+            return cached
+
+        def load():
+            with self._lock:
+                self.upstream_calls += 1
+            result = fetch()
+            self._cache.put("search", key, result)
+            return result
+
+        result, shared = self._flight.do(key, load)
+        if shared:
+            with self._lock:
+                self.coalesced += 1
+        return result
+
+    def stats(self):
+        cache = self._cache.stats()
+        with self._lock:
+            misses = self.requests - cache["hits"]
+            return {
+                "requests": self.requests,
+                "cache_hits": cache["hits"],
+                "coalesced": self.coalesced,
+                "upstream_calls": self.upstream_calls,
+                "cache_hit_ratio": cache["hits"] / self.requests if self.requests else 0.0,
+                "coalesce_ratio": self.coalesced / misses if misses > 0 else 0.0,
+            }
+
+
+_coalescers = {}
+_coalescers_lock = threading.Lock()
+
+
+def search_coalescer_from_config(config):
+    """Devuelve el SearchCoalescer del proceso para esta configuracion."""
+    key = (
+        config.get("SPOTIFY_SEARCH_CACHE_TTL", 60),
+        config.get("SPOTIFY_SEARCH_CACHE_MAX_ENTRIES", 2000),
+    )
+    with _coalescers_lock:
+        coalescer = _coalescers.get(key)
+        if coalescer is None:
+            coalescer = SearchCoalescer(ttl=key[0], max_entries=key[1])
+            _coalescers[key] = coalescer
+        return coalescer
+
+
+def all_coalescers():
+    """Todos los SearchCoalescer creados en el proceso."""
+    with _coalescers_lock:
+        return list(_coalescers.values())
@@ -0,0 +1,155 @@
+"""
+Segundo nivel de la cache de metadatos en disco (SQLite en modo WAL).
+
+Sobrevive a reinicios y despliegues y la comparten todos los workers de la
+maquina: cada uno mantiene su cache en memoria y, ante un fallo, consulta
+aqui antes de ir a Spotify. Cada entrada lleva su caducidad; el tamano se
+limita por numero de entradas expulsando las de acceso mas antiguo (LRU).
+Cualquier error de disco se trata como un fallo de cache.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from ..models import from_dict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    etag TEXT,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at);
+"""
+
+SQL_GET = "SELECT value, etag, expires_at, accessed_at FROM entries WHERE kind = ? AND key = ?"
+SQL_PUT = (
+    "INSERT OR REPLACE INTO entries (kind, key, value, etag, expires_at, accessed_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+# El acceso se anota como mucho una vez por TOUCH_INTERVAL para no escribir en cada lectura
+SQL_TOUCH = "UPDATE entries SET accessed_at = ? WHERE kind = ? AND key = ? AND accessed_at < ?"
+SQL_TRIM = (
+    "DELETE FROM entries WHERE (kind, key) IN "
+    "(SELECT kind, key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)"
+)
+
+TOUCH_INTERVAL = 60
+
+
+class DiskCache:
+    def __init__(self, path, max_entries=200000, trim_every=256, timeout=0.5):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.trim_every = trim_every
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hits=0, misses=0, errors=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.errors += errors
+
+    def get_many(self, kind, keys, include_expired=False):
+        """
+        Devuelve {clave: (entidad, expires_at, etag)} con las entradas aun
+        vigentes (o todas con `include_expired`); las demas no aparecen.
+        """
+        found = {}
+        now = time.time()
+        try:
+            conn = self._conn()
+            touched = []
+            for key in keys:
+                row = conn.execute(SQL_GET, (kind, key)).fetchone()
+                if row is None or (row[2] <= now and not include_expired):
+                    continue
+                found[key] = (from_dict(kind, json.loads(row[0])), row[2], row[1])
+                if row[3] < now - TOUCH_INTERVAL:
+                    touched.append((now, kind, key, now - TOUCH_INTERVAL))
+            if touched:
+                conn.executemany(SQL_TOUCH, touched)
+        except (sqlite3.Error, ValueError, TypeError, KeyError):
+            self._count(errors=1)
+            return found
+        self._count(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def get(self, kind, key):
+        """(entidad, expires_at, etag) o None."""
+        return self.get_many(kind, [key]).get(key)
+
+    def put_many(self, kind, items):
+        """Guarda [(clave, entidad, expires_at, etag), ...] en una sola transaccion."""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (kind, key, json.dumps(value.to_dict(), ensure_ascii=False, separators=(",", ":")),
+             etag, expires_at, now)
+            for key, value, expires_at, etag in items
+        ]
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(SQL_PUT, rows)
+        except sqlite3.Error:
+            self._count(errors=1)
+            return
+
+        with self._lock:
+            self._puts_since_trim += len(rows)
+            trim = self._puts_since_trim >= self.trim_every
+            if trim:
+                self._puts_since_trim = 0
+        if trim:
+            self.trim()
+
+    def put(self, kind, key, value, expires_at, etag=None):
+        self.put_many(kind, [(key, value, expires_at, etag)])
+
+    def trim(self):
+        """Expulsa las entradas de acceso mas antiguo por encima de max_entries."""
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(SQL_TRIM, (self.max_entries,))
+        except sqlite3.Error:
+            self._count(errors=1)
+
+    def clear(self):
+        try:
+            self._conn().execute("DELETE FROM entries")
+        except sqlite3.Error:
+            self._count(errors=1)
+
+    def stats(self):
+        with self._lock:
+            return {"disk_hits": self.hits, "disk_misses": self.misses, "disk_errors": self.errors}
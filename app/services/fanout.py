@@ -0,0 +1,145 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    """Se agoto el tiempo asignado a la peticion antes de terminar la llamada."""
+
+
+def current_deadline():
+    """Deadline (time.monotonic) del hilo actual o None si no hay."""
+    return getattr(_local, "deadline", None)
+
+
+def remaining_time():
+    """Segundos restantes hasta el deadline del hilo actual (None si no hay)."""
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Propaga un deadline a las llamadas upstream hechas en este hilo."""
+    previous = current_deadline()
+    if previous is not None and deadline is not None:
+        deadline = min(previous, deadline)
+    _local.deadline = deadline if deadline is not None else previous
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+class FanoutResult:
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        # Excepcion original de cada tarea fallida (errors guarda su mensaje)
+        self.exceptions = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+class FanoutExecutor:
+    """
+    Ejecuta llamadas upstream independientes en paralelo sobre un pool
+    compartido por el proceso.
+
+    `max_workers` es el limite global; cada llamada a run() tiene ademas su
+    propio limite de concurrencia. Si el pool esta lleno la tarea se ejecuta
+    en el hilo que llama, de modo que los fan-out anidados no se bloquean.
+    """
+
+    def __init__(self, max_workers=16):
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fanout")
+
+    def _call(self, func, deadline):
+        with deadline_scope(deadline):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DeadlineExceeded("deadline excedido")
+            return func()
+
+    def _start(self, func, deadline):
+        if self._slots.acquire(blocking=False):
+            future = self._pool.submit(self._call, func, deadline)
+            # Libera el hueco al terminar o al cancelarse antes de empezar
+            future.add_done_callback(lambda _: self._slots.release())
+            return future
+        # Pool lleno: ejecutar en el hilo actual (caller-runs)
+        return _run_inline(func, deadline)
+
+    def run(self, tasks, max_concurrency=4, timeout=None):
+        """
+        Ejecuta `tasks` (dict nombre -> callable sin argumentos) y devuelve
+        un FanoutResult con los resultados y los errores por tarea.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        parent = current_deadline()
+        if parent is not None:
+            deadline = parent if deadline is None else min(deadline, parent)
+
+        result = FanoutResult()
+        pending = list(tasks.items())
+        running = {}
+
+        while pending or running:
+            while pending and len(running) < max_concurrency:
+                name, func = pending.pop(0)
+                running[self._start(func, deadline)] = name
+
+            wait_for = None
+            if deadline is not None:
+                wait_for = max(0.0, deadline - time.monotonic())
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Deadline agotado: se reportan las tareas sin terminar
+                for name in list(running.values()) + [name for name, _ in pending]:
+                    result.errors[name] = "deadline excedido"
+                    result.exceptions[name] = DeadlineExceeded("deadline excedido")
+                for future in running:
+                    future.cancel()
+                break
+
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result.results[name] = future.result()
+                except Exception as e:
+                    result.errors[name] = str(e) or e.__class__.__name__
+                    result.exceptions[name] = e
+        return result
+
+
+def _run_inline(func, deadline):
+    future = Future()
+    try:
+        with deadline_scope(deadline):
+            future.set_result(func())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_fanout_executor(max_workers=16):
+    """Devuelve el executor compartido del proceso."""
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = FanoutExecutor(max_workers)
+            _executors[max_workers] = executor
+        return executor
@@ -0,0 +1,62 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Solo se reintentan metodos idempotentes; los POST (token) no se repiten.
+# Los 429 no se reintentan aqui: los gestiona el planificador (rate_limiter).
+RETRY_METHODS = frozenset({"GET", "HEAD"})
+RETRY_STATUS = (500, 502, 503, 504)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def build_session(pool_size=20, retries=2, backoff=0.2, jitter=0.1):
+    """Crea una sesion HTTP con pool keep-alive y reintentos con backoff."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        backoff_jitter=jitter,
+        allowed_methods=RETRY_METHODS,
+        status_forcelist=RETRY_STATUS,
+        raise_on_status=False,
+        # Sin esto urllib3 reintenta los 429 por su cuenta durmiendo Retry-After
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(pool_size=20, retries=2, backoff=0.2, jitter=0.1):
+    """Devuelve la sesion compartida del proceso para esta configuracion."""
+    key = (pool_size, retries, backoff, jitter)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = build_session(pool_size, retries, backoff, jitter)
+            _sessions[key] = session
+        return session
+
+
+def transport_from_config(config):
+    """Devuelve (session, timeout) a partir de la configuracion de Flask."""
+    session = get_session(
+        pool_size=config.get("SPOTIFY_HTTP_POOL_SIZE", 20),
+        retries=config.get("SPOTIFY_HTTP_RETRIES", 2),
+        backoff=config.get("SPOTIFY_HTTP_BACKOFF", 0.2),
+        jitter=config.get("SPOTIFY_HTTP_BACKOFF_JITTER", 0.1),
+    )
+    timeout = (
+        config.get("SPOTIFY_HTTP_CONNECT_TIMEOUT", 3.05),
+        config.get("SPOTIFY_HTTP_READ_TIMEOUT", 10),
+    )
+    return session, timeout
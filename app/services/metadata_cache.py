@@ -0,0 +1,360 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .disk_cache import DiskCache
+from .rate_limiter import mark_background_thread
+from .search_index import search_index_from_config
+
+DEFAULT_TTLS = {"track": 86400, "album": 86400, "artist": 3600}
+
+
+def _to_json(value):
+    # Entidades compactas (app.models): se mide su proyeccion publica
+    return value.to_dict()
+
+
+class MetadataCache:
+    """
+    Cache en memoria TTL + LRU para metadatos de Spotify (track/album/artist).
+
+    Guarda las entidades compactas de app.models, no el JSON de Spotify, y un
+    hash de su contenido que sirve de ETag (`content_hash`). Con `disk`, los
+    fallos se consultan en la cache en disco antes de cargar, y todo lo que
+    se carga se escribe tambien alli. Con `index` (LocalSearchIndex), todo lo
+    que entra en memoria se indexa para la busqueda local.
+    Limitada por numero de entradas y, opcionalmente, por bytes (tamano JSON
+    aproximado). Una entrada caducada se sigue sirviendo durante `stale_ttl`
+    segundos mientras se refresca en segundo plano (stale-while-revalidate).
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=0, ttls=None, stale_ttl=86400, refresh_workers=2,
+                 content_hash=True, disk=None, index=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stale_ttl = stale_ttl
+        self.content_hash = content_hash
+        # Segundo nivel opcional (DiskCache): memoria -> disco -> upstream
+        self.disk = disk
+        self.index = index
+
+        # (kind, key) -> [value, expires_at, size, etag]
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        # Los refrescos en segundo plano ceden el paso a las llamadas interactivas
+        self._executor = ThreadPoolExecutor(
+            max_workers=refresh_workers,
+            thread_name_prefix="metadata-refresh",
+            initializer=mark_background_thread,
+        )
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _size_of(self, value):
+        if not self.max_bytes:
+            return 0
+        return len(json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_to_json))
+
+    def digest(self, value):
+        """Hash estable del contenido (JSON con claves ordenadas)."""
+        encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=_to_json)
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=12).hexdigest()
+
+    def _lookup(self, kind, key):
+        """Devuelve (valor, estado) con estado 'fresh', 'stale' o None. Requiere el lock."""
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return None, None
+        value, expires_at = entry[0], entry[1]
+        now = time.time()
+        if now < expires_at:
+            self._entries.move_to_end((kind, key))
+            return value, "fresh"
+        if now < expires_at + self.stale_ttl:
+            self._entries.move_to_end((kind, key))
+            return value, "stale"
+        # Se conserva como ultimo valor conocido (peek_many) hasta que se
+        # reemplace o lo expulse el LRU
+        return None, None
+
+    def _remove(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[2]
+            self.evictions += 1
+
+    def get(self, kind, key):
+        """Devuelve el valor si esta fresco o en ventana stale; None en otro caso."""
+        with self._lock:
+            value, state = self._lookup(kind, key)
+            if state == "fresh":
+                self.hits += 1
+            elif state == "stale":
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+        if state is None:
+            value = self._from_disk(kind, [key]).get(key)
+        return value
+
+    def _entry(self, kind, value, expires_at=None, etag=None):
+        if etag is None and self.content_hash:
+            etag = self.digest(value)
+        if expires_at is None:
+            expires_at = time.time() + self.ttls.get(kind, 3600)
+        return [value, expires_at, self._size_of(value), etag]
+
+    def _store(self, kind, entries):
+        """Inserta {clave: entrada} en memoria. No requiere el lock."""
+        with self._lock:
+            for key, entry in entries.items():
+                self._remove((kind, key))
+                self._entries[(kind, key)] = entry
+                self._bytes += entry[2]
+            self._evict()
+        if self.index is not None:
+            self.index.add_many(kind, [entry[0] for entry in entries.values()])
+
+    def put(self, kind, key, value):
+        self.put_many(kind, {key: value})
+
+    def put_many(self, kind, values):
+        """Guarda {clave: valor} en memoria y, si hay, en disco (una transaccion)."""
+        entries = {key: self._entry(kind, value) for key, value in values.items()}
+        self._store(kind, entries)
+        if self.disk is not None:
+            self.disk.put_many(kind, [(key, e[0], e[1], e[3]) for key, e in entries.items()])
+
+    def _from_disk(self, kind, keys):
+        """Busca `keys` en disco; lo encontrado se sube a memoria con su caducidad."""
+        if self.disk is None or not keys:
+            return {}
+        found = self.disk.get_many(kind, keys)
+        self._store(kind, {
+            key: self._entry(kind, value, expires_at, etag)
+            for key, (value, expires_at, etag) in found.items()
+        })
+        return {key: value for key, (value, _, _) in found.items()}
+
+    def expiry_many(self, kind, keys):
+        """{clave: expires_at} de las entradas en memoria (sin contar accesos)."""
+        with self._lock:
+            found = {}
+            for key in keys:
+                entry = self._entries.get((kind, key))
+                if entry is not None:
+                    found[key] = entry[1]
+            return found
+
+    def peek_many(self, kind, keys):
+        """
+        Ultimo valor conocido de cada clave aunque haya caducado (memoria y
+        disco), sin cargar nada ni contar accesos. Para servir algo cuando
+        Spotify no esta disponible.
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get((kind, key))
+                if entry is not None:
+                    found[key] = entry[0]
+        missing = [key for key in keys if key not in found]
+        if self.disk is not None and missing:
+            on_disk = self.disk.get_many(kind, missing, include_expired=True)
+            found.update((key, value) for key, (value, _, _) in on_disk.items())
+        return found
+
+    def fresh_etag(self, kind, key):
+        """ETag de la entrada si esta fresca (sin cargar nada ni contar acceso); None si no."""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None or time.time() >= entry[1]:
+                return None
+            return entry[3]
+
+    def etag_for(self, kind, key, value):
+        """ETag de `value`: el guardado en la entrada si es el mismo objeto, si no se calcula."""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None and entry[0] is value and entry[3] is not None:
+                return entry[3]
+        return self.digest(value)
+
+    def get_or_load(self, kind, key, loader):
+        """
+        Devuelve la entrada cacheada o la carga con `loader()`.
+        Si la entrada esta caducada, la devuelve igualmente y lanza un
+        refresco en segundo plano (uno por clave).
+        """
+        with self._lock:
+            value, state = self._lookup(kind, key)
+            if state == "fresh":
+                self.hits += 1
+                return value
+            if state == "stale":
+                self.stale_hits += 1
+                if (kind, key) not in self._refreshing:
+                    self._refreshing.add((kind, key))
+                    self._executor.submit(self._refresh, kind, key, loader)
+                return value
+            self.misses += 1
+
+        value = self._from_disk(kind, [key]).get(key)
+        if value is not None:
+            return value
+        value = loader()
+        self.put(kind, key, value)
+        return value
+
+    def get_many_or_load(self, kind, keys, batch_loader):
+        """
+        Variante por lotes de get_or_load: `batch_loader(keys)` devuelve un
+        dict clave -> valor solo para las claves que no estan en cache.
+        Las entradas caducadas se sirven y se refrescan en un unico lote en
+        segundo plano.
+        """
+        found = {}
+        missing = []
+        stale = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                value, state = self._lookup(kind, key)
+                if state == "fresh":
+                    self.hits += 1
+                    found[key] = value
+                elif state == "stale":
+                    self.stale_hits += 1
+                    found[key] = value
+                    if (kind, key) not in self._refreshing:
+                        self._refreshing.add((kind, key))
+                        stale.append(key)
+                else:
+                    self.misses += 1
+                    missing.append(key)
+
+        if stale:
+            self._executor.submit(self._refresh_many, kind, stale, batch_loader)
+
+        if missing:
+            on_disk = self._from_disk(kind, missing)
+            found.update(on_disk)
+            missing = [key for key in missing if key not in on_disk]
+
+        if missing:
+            loaded = batch_loader(missing)
+            self.put_many(kind, loaded)
+            found.update(loaded)
+        return found
+
+    def _refresh_many(self, kind, keys, batch_loader):
+        try:
+            loaded = batch_loader(keys)
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        else:
+            self.put_many(kind, loaded)
+            with self._lock:
+                self.refreshes += len(loaded)
+        finally:
+            with self._lock:
+                self._refreshing.difference_update((kind, key) for key in keys)
+
+    def _refresh(self, kind, key, loader):
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        else:
+            self.put(kind, key, value)
+            with self._lock:
+                self.refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard((kind, key))
+
+    def clear(self):
+        """Vacia la cache en memoria (la de disco se conserva)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        disk = self.disk.stats() if self.disk is not None else {}
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                **disk,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def metadata_cache_from_config(config):
+    """Devuelve la cache de metadatos del proceso para esta configuracion."""
+    ttls = {
+        "track": config.get("SPOTIFY_CACHE_TTL_TRACK", DEFAULT_TTLS["track"]),
+        "album": config.get("SPOTIFY_CACHE_TTL_ALBUM", DEFAULT_TTLS["album"]),
+        "artist": config.get("SPOTIFY_CACHE_TTL_ARTIST", DEFAULT_TTLS["artist"]),
+    }
+    key = (
+        config.get("SPOTIFY_CACHE_MAX_ENTRIES", 10000),
+        config.get("SPOTIFY_CACHE_MAX_BYTES", 0),
+        config.get("SPOTIFY_CACHE_STALE_TTL", 86400),
+        tuple(sorted(ttls.items())),
+        config.get("SPOTIFY_DISK_CACHE_DIR") or None,
+        config.get("SPOTIFY_DISK_CACHE_MAX_ENTRIES", 200000),
+        config.get("SEARCH_INDEX_ENABLED", True),
+        config.get("SEARCH_INDEX_MAX_ENTITIES", 100000),
+        config.get("SEARCH_INDEX_MAX_CANDIDATES", 5000),
+    )
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            disk = None
+            if key[4]:
+                disk = DiskCache(Path(key[4]) / "metadata.db", max_entries=key[5])
+            cache = MetadataCache(
+                max_entries=key[0], max_bytes=key[1], ttls=ttls, stale_ttl=key[2], disk=disk,
+                index=search_index_from_config(config),
+            )
+            _caches[key] = cache
+        return cache
+
+
+def all_caches():
+    """Todas las caches de metadatos creadas en el proceso."""
+    with _caches_lock:
+        return list(_caches.values())
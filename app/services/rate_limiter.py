@@ -0,0 +1,201 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from .fanout import DeadlineExceeded, remaining_time
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+_local = threading.local()
+
+
+def current_priority():
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+def set_thread_priority(priority):
+    """Fija la prioridad por defecto del hilo (p. ej. en hilos de refresco)."""
+    _local.priority = priority
+
+
+def mark_background_thread():
+    """Inicializador para pools cuyo trabajo nunca es interactivo."""
+    set_thread_priority(BACKGROUND)
+
+
+@contextmanager
+def priority_scope(priority):
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class UpstreamThrottled(Exception):
+    """Spotify respondio 429 o el planificador no pudo despachar a tiempo."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value, default=1.0):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+class UpstreamScheduler:
+    """
+    Planificador compartido de llamadas a Spotify.
+
+    - Token bucket: `rate` llamadas por segundo con rafagas de hasta `burst`.
+    - Un 429 con Retry-After pausa el despacho de todo el proceso.
+    - Concurrencia adaptativa (AIMD): se reduce a la mitad con cada 429 y
+      crece poco a poco con las respuestas correctas.
+    - Las llamadas en segundo plano solo salen si no hay interactivas en cola.
+    """
+
+    def __init__(self, rate=20.0, burst=40, max_concurrency=16, min_concurrency=1, max_wait=10.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+
+        self.dispatched = 0
+        self.throttled = 0
+        self.throttle_time_total = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _wait_time(self, priority, now):
+        """Segundos a esperar antes de poder despachar (0 si ya se puede). Requiere el lock."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if priority == BACKGROUND and self._waiting[INTERACTIVE]:
+            return 0.05
+        if self._in_flight >= int(self._limit):
+            return 0.05
+        self._refill(now)
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0.0
+
+    def acquire(self, priority=None):
+        """
+        Espera turno para una llamada. Falla con UpstreamThrottled si no se
+        consigue en `max_wait` segundos (o de inmediato si la pausa por 429 es
+        mas larga), o con DeadlineExceeded si antes vence el deadline.
+        """
+        priority = priority or current_priority()
+        started = time.monotonic()
+        limit = self.max_wait
+        remaining = remaining_time()
+        by_deadline = remaining is not None and remaining < limit
+        if by_deadline:
+            limit = remaining
+        give_up_at = started + limit
+
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(priority, now)
+                    if wait <= 0:
+                        break
+                    left = give_up_at - now
+                    paused = now < self._paused_until
+                    if left <= 0 or (paused and wait > left):
+                        if by_deadline:
+                            raise DeadlineExceeded("deadline excedido esperando turno upstream")
+                        raise UpstreamThrottled(
+                            "Spotify limita las peticiones; intentalo mas tarde",
+                            retry_after=max(1.0, self._paused_until - now),
+                        )
+                    self._cond.wait(min(wait, left))
+                self._tokens -= 1
+                self._in_flight += 1
+                self.dispatched += 1
+            finally:
+                self._waiting[priority] -= 1
+                self.throttle_time_total += time.monotonic() - started
+
+    def release(self, status_code=None, retry_after=None):
+        with self._cond:
+            self._in_flight -= 1
+            if status_code == 429:
+                self.throttled += 1
+                self._limit = max(self.min_concurrency, self._limit / 2)
+                pause = retry_after if retry_after is not None else 1.0
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            elif status_code is not None and status_code < 500:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None):
+        """Reserva turno; el bloque debe fijar `outcome['status']` y opcionalmente `retry_after`."""
+        self.acquire(priority)
+        outcome = {"status": None, "retry_after": None}
+        try:
+            yield outcome
+        finally:
+            self.release(outcome["status"], outcome["retry_after"])
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": sum(self._waiting.values()),
+                "queue_depth_interactive": self._waiting[INTERACTIVE],
+                "queue_depth_background": self._waiting[BACKGROUND],
+                "in_flight": self._in_flight,
+                "concurrency_limit": int(self._limit),
+                "dispatched": self.dispatched,
+                "throttled": self.throttled,
+                "throttle_time_total": self.throttle_time_total,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def scheduler_from_config(config):
+    """Devuelve el planificador upstream del proceso para esta configuracion."""
+    key = (
+        config.get("SPOTIFY_RATE_LIMIT_PER_SECOND", 20.0),
+        config.get("SPOTIFY_RATE_LIMIT_BURST", 40),
+        config.get("SPOTIFY_MAX_CONCURRENCY", 16),
+        config.get("SPOTIFY_SCHEDULER_MAX_WAIT", 10.0),
+    )
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = UpstreamScheduler(
+                rate=key[0], burst=key[1], max_concurrency=key[2], max_wait=key[3]
+            )
+            _schedulers[key] = scheduler
+        return scheduler
+
+
+def all_schedulers():
+    """Todos los planificadores creados en el proceso."""
+    with _schedulers_lock:
+        return list(_schedulers.values())
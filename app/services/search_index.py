@@ -0,0 +1,268 @@
+"""
+Indice local de busqueda por trigramas sobre el catalogo ya cacheado.
+
+Cada entidad que entra en la cache de metadatos (o llega en una busqueda)
+se indexa por los trigramas de su texto: nombre y artistas en tracks y
+albumes, nombre y generos en artistas. El texto se normaliza (minusculas,
+sin acentos ni signos) y cada palabra se rodea de espacios, asi que los
+prefijos de palabra tambien son trigramas (" ab" para "abba"); la ultima
+palabra de la consulta se trata como prefijo.
+
+Por cada tipo, las entidades ocupan slots crecientes y cada trigrama guarda
+sus slots en un array("i") ordenado (4 bytes por aparicion). La memoria se
+acota con `max_entities` por tipo: al pasarse se expulsan los slots mas
+antiguos (FIFO) subiendo un suelo, y de vez en cuando se recortan los
+prefijos ya expulsados de cada lista.
+
+Una consulta exige que aparezcan al menos 3/4 de sus trigramas (y no
+admite mas de MAX_MISSES ausentes). Los
+candidatos salen de las listas mas cortas (si se pueden fallar m trigramas,
+todo candidato esta en alguna de las m+1 listas mas cortas) y el resto se
+comprueba por busqueda binaria. Se ordena por similitud de Jaccard entre
+conjuntos de trigramas y, a igualdad, por lo mas reciente.
+
+De cada lista semilla solo se toman los `max_candidates` slots mas
+recientes (SEARCH_INDEX_MAX_CANDIDATES): es una ventana de recencia. Si esa
+ventana no da `limit` resultados, se repite recorriendo entera la lista mas
+corta, asi que una entidad con todos los trigramas de la consulta se
+encuentra por antigua que sea; las coincidencias aproximadas (a las que
+falta algun trigrama) se buscan solo en la ventana de las demas semillas.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# Campos indexados de cada tipo de entidad
+TEXT_FIELDS = {
+    "track": ("name", "artists"),
+    "album": ("name", "artists"),
+    "artist": ("name", "genres"),
+}
+
+# Trigramas de la consulta que pueden faltar: 1 de cada 4, como mucho MAX_MISSES
+# (una errata cuesta hasta 3; mas listas semilla encarecen las consultas largas)
+MAX_MISSES = 3
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    """Minusculas, sin acentos ni signos de puntuacion y espacios colapsados."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def trigrams(text, prefix=False):
+    """
+    Trigramas de `text` normalizado, con cada palabra entre espacios. Con
+    `prefix` la ultima palabra no se cierra: "bea" casa con "beatles".
+    """
+    grams = set()
+    words = text.split()
+    for position, word in enumerate(words):
+        padded = f" {word}" if prefix and position == len(words) - 1 else f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def entity_text(kind, entity):
+    parts = []
+    for name in TEXT_FIELDS[kind]:
+        value = getattr(entity, name)
+        parts.extend(value if isinstance(value, tuple) else (value or "",))
+    return normalize(" ".join(parts))
+
+
+class _KindIndex:
+    """Indice de un tipo de entidad. Sin lock propio: lo protege LocalSearchIndex."""
+
+    def __init__(self, max_entities):
+        self.max_entities = max_entities
+        self.postings = {}          # trigrama -> array("i") de slots crecientes
+        self.entities = []          # slot - base -> entidad (None si se reemplazo)
+        self.sizes = array("H")     # slot - base -> numero de trigramas
+        self.slot_of = {}           # id -> slot vigente
+        self.base = 0               # slot de entities[0]
+        self.floor = 0              # los slots por debajo estan expulsados
+        self.dead = 0               # slots reemplazados entre floor y el final
+
+    @property
+    def next_slot(self):
+        return self.base + len(self.entities)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def add(self, kind, entity):
+        text = entity_text(kind, entity)
+        old = self.slot_of.get(entity.id)
+        if old is not None:
+            previous = self.entities[old - self.base]
+            if previous is entity or entity_text(kind, previous) == text:
+                # Mismo texto: basta con apuntar a la entidad nueva
+                self.entities[old - self.base] = entity
+                return
+            self.entities[old - self.base] = None
+            self.dead += 1
+
+        slot = self.next_slot
+        grams = trigrams(text)
+        for gram in grams:
+            slots = self.postings.get(gram)
+            if slots is None:
+                slots = self.postings[gram] = array("i")
+            slots.append(slot)
+        self.entities.append(entity)
+        self.sizes.append(min(len(grams), 0xFFFF))
+        self.slot_of[entity.id] = slot
+
+        while self.next_slot - self.floor > self.max_entities:
+            self._evict_oldest()
+        if self.floor - self.base > max(self.max_entities // 4, 1024):
+            self._trim()
+
+    def _evict_oldest(self):
+        expired = self.entities[self.floor - self.base]
+        if expired is None:
+            self.dead -= 1
+        else:
+            del self.slot_of[expired.id]
+            self.entities[self.floor - self.base] = None
+        self.floor += 1
+
+    def _trim(self):
+        """Recorta de cada lista y de las tablas por slot lo que esta bajo el suelo."""
+        for gram in list(self.postings):
+            slots = self.postings[gram]
+            cut = bisect_left(slots, self.floor)
+            if cut == len(slots):
+                del self.postings[gram]
+            elif cut:
+                del slots[:cut]
+        cut = self.floor - self.base
+        del self.entities[:cut]
+        del self.sizes[:cut]
+        self.base = self.floor
+
+    def search(self, grams, limit, max_candidates):
+        if not grams:
+            return []
+        floor = self.floor
+        lists = []
+        for gram in grams:
+            slots = self.postings.get(gram)
+            if slots is None:
+                lists.append((0, None, 0))
+            else:
+                start = bisect_left(slots, floor)
+                lists.append((len(slots) - start, slots, start))
+        lists.sort(key=lambda item: item[0])
+
+        misses = min(len(grams) // 4, MAX_MISSES)
+        needed = len(grams) - misses
+        seeds, rest = lists[:misses + 1], lists[misses + 1:]
+        if seeds[-1][0] == 0:
+            return []
+
+        # Candidatos: los mas recientes de cada lista semilla; si no bastan, la mas corta entera
+        scored = self._score(self._candidates(seeds, max_candidates, False), rest, needed, len(grams))
+        if len(scored) < limit and seeds[0][0] > max_candidates:
+            scored = self._score(self._candidates(seeds, max_candidates, True), rest, needed, len(grams))
+        return [self.entities[slot - self.base] for _, slot in heapq.nlargest(limit, scored)]
+
+    @staticmethod
+    def _candidates(seeds, max_candidates, full_shortest):
+        counts = Counter()
+        for position, (_, slots, start) in enumerate(seeds):
+            if slots is not None:
+                if not (full_shortest and position == 0):
+                    start = max(start, len(slots) - max_candidates)
+                counts.update(slots[start:])
+        return counts
+
+    def _score(self, counts, rest, needed, total):
+        scored = []
+        for slot, hits in counts.items():
+            budget = hits + len(rest) - needed
+            if budget < 0:
+                continue
+            for _, slots, start in rest:
+                position = bisect_left(slots, slot, start)
+                if position < len(slots) and slots[position] == slot:
+                    hits += 1
+                else:
+                    budget -= 1
+                    if budget < 0:
+                        break
+            if budget < 0 or self.entities[slot - self.base] is None:
+                continue
+            size = self.sizes[slot - self.base]
+            scored.append((hits / (total + size - hits), slot))
+        return scored
+
+
+class LocalSearchIndex:
+    def __init__(self, max_entities=100000, max_candidates=5000):
+        self.max_entities = max_entities
+        self.max_candidates = max_candidates
+        self._kinds = {kind: _KindIndex(max_entities) for kind in TEXT_FIELDS}
+        self._lock = threading.Lock()
+        self.indexed = 0
+        self.queries = 0
+
+    def add_many(self, kind, entities):
+        """Indexa (o actualiza) entidades de tipo `kind`; otros tipos se ignoran."""
+        index = self._kinds.get(kind)
+        if index is None:
+            return
+        with self._lock:
+            for entity in entities:
+                index.add(kind, entity)
+                self.indexed += 1
+
+    def search(self, kind, query, limit=10):
+        """Hasta `limit` entidades de tipo `kind` que casan con `query`, mejores primero."""
+        grams = trigrams(normalize(query), prefix=True)
+        with self._lock:
+            self.queries += 1
+            return self._kinds[kind].search(grams, limit, self.max_candidates)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entities": sum(len(index) for index in self._kinds.values()),
+                "trigrams": sum(len(index.postings) for index in self._kinds.values()),
+                "postings": sum(
+                    len(slots) for index in self._kinds.values() for slots in index.postings.values()
+                ),
+                "indexed": self.indexed,
+                "queries": self.queries,
+            }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def search_index_from_config(config):
+    """Indice local de busqueda del proceso; None si SEARCH_INDEX_ENABLED esta desactivado."""
+    if not config.get("SEARCH_INDEX_ENABLED", True):
+        return None
+    key = (config.get("SEARCH_INDEX_MAX_ENTITIES", 100000), config.get("SEARCH_INDEX_MAX_CANDIDATES", 5000))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = LocalSearchIndex(max_entities=key[0], max_candidates=key[1])
+            _indexes[key] = index
+        return index
+
+
+def all_search_indexes():
+    """Todos los indices locales de busqueda creados en el proceso."""
+    with _indexes_lock:
+        return list(_indexes.values())
@@ -1,83 +1,277 @@
-import base64
 import time
+
 import requests
+from flask import current_app, g
 
-from flask import current_app
+from ..metrics import metrics
+from ..models import from_spotify
+from .circuit_breaker import FAMILIES, CircuitOpen, breaker_from_config, unguarded
+from .coalescer import normalize_search_key, search_coalescer_from_config
+from .fanout import DeadlineExceeded, get_fanout_executor, remaining_time
+from .http_transport import transport_from_config
+from .metadata_cache import metadata_cache_from_config
+from .rate_limiter import (
+    UpstreamThrottled,
+    current_priority,
+    parse_retry_after,
+    priority_scope,
+    scheduler_from_config,
+)
+from .search_index import search_index_from_config
+from .token_manager import get_token_manager
 
+# Valores por defecto; se pueden sobreescribir con la configuracion de la app
 SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
 SPOTIFY_API_BASE_URL = "https://api.spotify.com/v1"
 
+
+def is_upstream_failure(error):
+    """True si `error` indica que Spotify no esta disponible (no un 4xx normal)."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (CircuitOpen, UpstreamThrottled, DeadlineExceeded, requests.RequestException))
+
+
+# Maximo de ids por llamada en GET /v1/tracks?ids= y GET /v1/artists?ids=
+MAX_IDS_PER_REQUEST = 50
+
 class SpotifyService:
     def __init__(self):
         self.client_id = current_app.config["SPOTIFY_CLIENT_ID"]
         self.client_secret = current_app.config["SPOTIFY_CLIENT_SECRET"]
-        self._access_token = None
-        self._token_expires_at = 0
-    
+        self.api_base_url = (current_app.config.get("SPOTIFY_API_BASE_URL") or SPOTIFY_API_BASE_URL).rstrip("/")
+        self.token_url = current_app.config.get("SPOTIFY_TOKEN_URL") or SPOTIFY_TOKEN_URL
+        self._token_manager = get_token_manager(
+            self.client_id,
+            self.client_secret,
+            self.token_url,
+            current_app.config.get("SPOTIFY_TOKEN_REFRESH_MARGIN", 60),
+        )
+        self._session, self._timeout = transport_from_config(current_app.config)
+        self.cache = metadata_cache_from_config(current_app.config)
+        self.search_coalescer = search_coalescer_from_config(current_app.config)
+        self.search_index = search_index_from_config(current_app.config)
+        self.scheduler = scheduler_from_config(current_app.config)
+        # Familia -> disyuntor (None si estan desactivados)
+        self.breakers = {
+            family: breaker_from_config(current_app.config, family) for family in set(FAMILIES.values())
+        }
+        self._throttle_retries = current_app.config.get("SPOTIFY_429_RETRIES", 1)
+        self.fanout = get_fanout_executor(current_app.config.get("SPOTIFY_FANOUT_MAX_WORKERS", 16))
+        self.fanout_concurrency = current_app.config.get("SPOTIFY_FANOUT_PER_REQUEST", 4)
+        # Errores de bloques que fallaron sin invalidar el resto de la respuesta
+        self.partial_errors = []
+        # True si algo de la respuesta salio de la cache caducada por fallo upstream
+        self.served_stale = False
+        # Llamadas hechas (operacion, estado, inicio, segundos), solo si se perfila la peticion
+        self.upstream_calls = [] if g.get("record_upstream_calls") else None
+        # conditional.py y profiling.py leen los servicios de la peticion al terminar
+        g.setdefault("spotify_services", []).append(self)
+
     def _get_access_token(self):
-        """Obtiene un token de Spotify usando Client Credentials."""
-        if self._access_token and time.time() < self._token_expires_at:
-            return self._access_token
+        """Obtiene un token de Spotify usando Client Credentials (compartido por proceso)."""
+        return self._token_manager.get_token(post=self._post)
 
-        auth_header = base64.b64encode(
-            f"{self.client_id}:{self.client_secret}".encode("utf-8")
-        ).decode("utf-8")
+    def _post(self, url, **kwargs):
+        return self._timed("token", self._session.post, url, **kwargs)
 
-        headers = {
-            "Authorization": f"Basic {auth_header}",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
-        data = {"grant_type": "client_credentials"}
+    def _request_timeout(self):
+        """Timeout (connect, read) recortado al deadline propagado, si lo hay."""
+        remaining = remaining_time()
+        if remaining is None:
+            return self._timeout
+        if remaining <= 0:
+            raise DeadlineExceeded("deadline excedido")
+        connect, read = self._timeout
+        return (min(connect, remaining), min(read, remaining))
 
-        response = requests.post(SPOTIFY_TOKEN_URL, headers=headers, data=data)
-        response.raise_for_status()
-        token_data = response.json()
+    def _timed(self, operation, send, url, **kwargs):
+        """Llamada HTTP con metricas por operacion del servicio y codigo de estado."""
+        labels = (("operation", operation),)
+        status = "error"
+        started = time.perf_counter()
+        metrics.gauge_add("spotify_upstream_in_flight", labels)
+        try:
+            resp = send(url, timeout=self._request_timeout(), **kwargs)
+            status = resp.status_code
+            return resp
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.gauge_add("spotify_upstream_in_flight", labels, -1)
+            labels += (("status", status),)
+            metrics.inc("spotify_upstream_requests_total", labels)
+            metrics.observe("spotify_upstream_duration_seconds", labels, elapsed)
+            if self.upstream_calls is not None:
+                self.upstream_calls.append((operation, status, started, elapsed))
 
-        self._access_token = token_data["access_token"]
-        self._token_expires_at = time.time() + token_data.get("expires_in", 3600) - 60
-
-        return self._access_token
-    
-    def _get_headers(self):
+    def _get(self, url, params=None, operation="get"):
+        """
+        GET autenticado sobre la sesion compartida (keep-alive, timeouts,
+        reintentos), despachado por el planificador comun. Un 429 pausa el
+        despacho segun Retry-After y se reintenta `SPOTIFY_429_RETRIES` veces.
+        Un 401 (token revocado o caducado antes de tiempo) invalida el token
+        compartido y se reintenta una vez con uno nuevo.
+        Pasa por el disyuntor de su familia: si esta abierto, CircuitOpen.
+        """
+        breaker = self.breakers.get(FAMILIES.get(operation))
         token = self._get_access_token()
-        return {"Authorization": f"Bearer {token}"}
+        headers = {"Authorization": f"Bearer {token}"}
+        attempt = 0
+        reauthenticated = False
+        while True:
+            guard = breaker.guard(failures=requests.RequestException) if breaker else unguarded()
+            with guard as call, self.scheduler.slot() as outcome:
+                call["started"] = time.monotonic()
+                resp = self._timed(operation, self._session.get, url, headers=headers, params=params)
+                outcome["status"] = resp.status_code
+                if resp.status_code == 429:
+                    outcome["retry_after"] = parse_retry_after(resp.headers.get("Retry-After"))
+                else:
+                    call["failed"] = resp.status_code >= 500
+            if resp.status_code == 401 and not reauthenticated:
+                self._token_manager.invalidate(token)
+                token = self._get_access_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                reauthenticated = True
+                continue
+            if resp.status_code != 429:
+                break
+            if attempt >= self._throttle_retries:
+                raise UpstreamThrottled(
+                    "Spotify limita las peticiones; intentalo mas tarde",
+                    retry_after=outcome["retry_after"],
+                )
+            attempt += 1
+        resp.raise_for_status()
+        return resp.json()
 
     def search(self, q, type_="track", limit=10, market="ES"):
         """
-        Replica aproximada de GET /v1/search de Spotify (solo type=track en este ejemplo).
+        Replica aproximada de GET /v1/search de Spotify; devuelve los items
+        del tipo pedido como entidades compactas (Track/Album/Artist).
+        Las busquedas identicas (q normalizada, type, limit, market) en vuelo
+        comparten una unica llamada y el resultado se cachea unos segundos;
+        a Spotify llega la q tal cual la escribio quien llama.
         """
-        url = f"{SPOTIFY_API_BASE_URL}/search"
+        key = normalize_search_key(q, type_, limit, market)
+        url = f"{self.api_base_url}/search"
         params = {
             "q": q,
             "type": type_,
             "limit": limit,
             "market": market,
         }
-        headers = self._get_headers()
-        resp = requests.get(url, headers=headers, params=params)
-        resp.raise_for_status()
-        return resp.json()
-    
+
+        def fetch():
+            data = self._get(url, params=params, operation="search")
+            items = data.get(f"{type_}s", {}).get("items", [])
+            entities = [from_spotify(type_, item) for item in items if item]
+            if self.search_index is not None:
+                self.search_index.add_many(type_, entities)
+            return entities
+
+        return self.search_coalescer.search(key, fetch)
+
+    def search_local(self, q, type_="track", limit=10):
+        """Busqueda sobre el indice local de lo ya visto; [] si esta desactivado."""
+        if self.search_index is None:
+            return []
+        return self.search_index.search(type_, q, limit)
+
+    def _get_entity(self, kind, entity_id):
+        url = f"{self.api_base_url}/{kind}s/{entity_id}"
+        try:
+            return self.cache.get_or_load(
+                kind, entity_id, lambda: from_spotify(kind, self._get(url, operation=f"get_{kind}"))
+            )
+        except Exception as e:
+            # Spotify caido o disyuntor abierto: lo ultimo que haya en cache
+            stale = self.cache.peek_many(kind, [entity_id]) if is_upstream_failure(e) else {}
+            if entity_id not in stale:
+                raise
+            self.served_stale = True
+            return stale[entity_id]
+
     def get_track(self, track_id):
-        """Replica GET /v1/tracks/{id}."""
-        url = f"{SPOTIFY_API_BASE_URL}/tracks/{track_id}"
-        headers = self._get_headers()
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        return resp.json()
+        """Replica GET /v1/tracks/{id} (Track, cacheado en memoria)."""
+        return self._get_entity("track", track_id)
 
     def get_album(self, album_id):
-        """Replica GET /v1/albums/{id}."""
-        url = f"{SPOTIFY_API_BASE_URL}/albums/{album_id}"
-        headers = self._get_headers()
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        return resp.json()
+        """Replica GET /v1/albums/{id} (Album, cacheado en memoria)."""
+        return self._get_entity("album", album_id)
 
     def get_artist(self, artist_id):
-        """Replica GET /v1/artists/{id}."""
-        url = f"{SPOTIFY_API_BASE_URL}/artists/{artist_id}"
-        headers = self._get_headers()
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        return resp.json()
+        """Replica GET /v1/artists/{id} (Artist, cacheado en memoria)."""
+        return self._get_entity("artist", artist_id)
+
+    def _fetch_several(self, kind, ids):
+        """
+        Pide a Spotify /v1/{kind}s?ids= en bloques de MAX_IDS_PER_REQUEST,
+        en paralelo. Si fallan todos los bloques se propaga la excepcion
+        original del primero (para distinguir una caida de Spotify de otros
+        errores); si solo fallan algunos se anotan en `partial_errors`.
+        """
+        url = f"{self.api_base_url}/{kind}s"
+        chunks = {
+            f"{kind}s[{start}:{start + MAX_IDS_PER_REQUEST}]": ids[start:start + MAX_IDS_PER_REQUEST]
+            for start in range(0, len(ids), MAX_IDS_PER_REQUEST)
+        }
+        # Los bloques heredan la prioridad de quien llama (p. ej. refrescos en segundo plano)
+        priority = current_priority()
+
+        def fetch(chunk):
+            with priority_scope(priority):
+                return self._get(url, params={"ids": ",".join(chunk)}, operation=f"get_several_{kind}s")
+
+        tasks = {name: (lambda chunk=chunk: fetch(chunk)) for name, chunk in chunks.items()}
+        result = self.fanout.run(tasks, max_concurrency=self.fanout_concurrency)
+        if not result.results and result.errors:
+            raise next(iter(result.exceptions.values()))
+        for name, message in result.errors.items():
+            self.partial_errors.append({"source": name, "message": message})
+
+        found = {}
+        for data in result.results.values():
+            for item in data.get(f"{kind}s", []):
+                # Spotify devuelve null para ids inexistentes
+                if item:
+                    found[item["id"]] = from_spotify(kind, item)
+        return found
+
+    def refresh_several(self, kind, ids):
+        """Vuelve a pedir `ids` a Spotify aunque esten en cache y los guarda en ella."""
+        found = self._fetch_several(kind, list(ids))
+        self.cache.put_many(kind, found)
+        return found
+
+    def _get_several(self, kind, ids):
+        """
+        Entidades de `ids` desde la cache o Spotify, en el orden pedido. Si
+        Spotify falla (todo o algunos bloques), los ids que falten se sirven
+        con lo ultimo que haya en cache aunque este caducado.
+        """
+        errors_before = len(self.partial_errors)
+        try:
+            found = self.cache.get_many_or_load(kind, ids, lambda missing: self._fetch_several(kind, missing))
+            failure = None
+        except Exception as e:
+            found, failure = {}, e
+
+        if failure is not None or len(self.partial_errors) > errors_before:
+            stale = self.cache.peek_many(kind, [key for key in ids if key not in found])
+            if failure is not None and not found and not stale:
+                raise failure
+            if failure is not None:
+                self.partial_errors.append({"source": f"{kind}s", "message": str(failure)})
+            if stale:
+                found.update(stale)
+                self.served_stale = True
+        return [found[key] for key in ids if key in found]
+
+    def get_several_tracks(self, track_ids):
+        """Replica GET /v1/tracks?ids= omitiendo los ids ya cacheados."""
+        return self._get_several("track", track_ids)
+
+    def get_several_artists(self, artist_ids):
+        """Replica GET /v1/artists?ids= omitiendo los ids ya cacheados."""
+        return self._get_several("artist", artist_ids)
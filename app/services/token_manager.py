@@ -0,0 +1,137 @@
+import base64
+import threading
+import time
+
+import requests
+
+
+class TokenManager:
+    """
+    Token de Spotify (Client Credentials) compartido por todo el proceso.
+
+    Solo un hilo refresca el token a la vez (single-flight); el resto espera
+    el resultado de ese refresco en lugar de pedir otro token. El refresco se
+    adelanta `refresh_margin` segundos a la caducidad real.
+    """
+
+    def __init__(self, client_id, client_secret, token_url, refresh_margin=60):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+
+        self._access_token = None
+        self._token_expires_at = 0
+        self._refreshing = False
+        self._last_error = None
+        self._cond = threading.Condition(threading.Lock())
+
+        # Contadores expuestos via stats()
+        self.refresh_count = 0
+        self.refresh_errors = 0
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+
+    def _is_fresh(self):
+        return self._access_token and time.time() < self._token_expires_at
+
+    def get_token(self, post=None):
+        """
+        Devuelve un token valido, refrescandolo si esta a punto de caducar.
+        `post` permite inyectar la funcion HTTP usada para pedir el token.
+        """
+        with self._cond:
+            if self._is_fresh():
+                return self._access_token
+
+            if self._refreshing:
+                # Otro hilo ya esta refrescando: esperar su resultado
+                started = time.monotonic()
+                while self._refreshing:
+                    self._cond.wait()
+                self.wait_count += 1
+                self.wait_time_total += time.monotonic() - started
+                if self._is_fresh():
+                    return self._access_token
+                if self._last_error is not None:
+                    raise self._last_error
+
+            self._refreshing = True
+
+        try:
+            token, expires_in = self._fetch_token(post or requests.post)
+        except Exception as e:
+            with self._cond:
+                self._refreshing = False
+                self._last_error = e
+                self.refresh_errors += 1
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._access_token = token
+            self._token_expires_at = time.time() + expires_in - self.refresh_margin
+            self._refreshing = False
+            self._last_error = None
+            self.refresh_count += 1
+            self._cond.notify_all()
+            return token
+
+    def _fetch_token(self, post):
+        auth_header = base64.b64encode(
+            f"{self.client_id}:{self.client_secret}".encode("utf-8")
+        ).decode("utf-8")
+
+        headers = {
+            "Authorization": f"Basic {auth_header}",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        data = {"grant_type": "client_credentials"}
+
+        response = post(self.token_url, headers=headers, data=data)
+        response.raise_for_status()
+        token_data = response.json()
+        return token_data["access_token"], token_data.get("expires_in", 3600)
+
+    def invalidate(self, token=None):
+        """
+        Fuerza un refresco en la siguiente llamada (p. ej. tras un 401). Con
+        `token`, solo si sigue siendo el vigente: varios 401 del mismo token
+        rechazado provocan un unico refresco.
+        """
+        with self._cond:
+            if token is not None and token != self._access_token:
+                return
+            self._access_token = None
+            self._token_expires_at = 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                "refresh_count": self.refresh_count,
+                "refresh_errors": self.refresh_errors,
+                "wait_count": self.wait_count,
+                "wait_time_total": self.wait_time_total,
+                "expires_in": max(0.0, self._token_expires_at - time.time()),
+            }
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(client_id, client_secret, token_url, refresh_margin=60):
+    """Devuelve el TokenManager del proceso para estas credenciales."""
+    key = (client_id, client_secret, token_url)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = TokenManager(client_id, client_secret, token_url, refresh_margin)
+            _managers[key] = manager
+        return manager
+
+
+def all_token_managers():
+    """Todos los TokenManager creados en el proceso."""
+    with _managers_lock:
+        return list(_managers.values())
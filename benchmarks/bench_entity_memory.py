@@ -0,0 +1,136 @@
+"""
+Memoria por entidad cacheada: JSON de Spotify tal cual (dict) frente a las
+entidades compactas de app.models (__slots__, solo los campos expuestos).
+
+Los payloads imitan a la API real (mercados, imagenes, objetos anidados) y
+cada uno se parsea desde bytes, como llega por la red, para no compartir
+cadenas entre entidades. Se mide con tracemalloc y con el RSS del proceso.
+
+Uso: python -m benchmarks.bench_entity_memory --entities 20000
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from app.models import from_spotify
+
+MARKETS = ["AD", "AR", "AT", "AU", "BE", "BG", "BO", "BR", "CA", "CH", "CL", "CO", "CR", "CY",
+           "CZ", "DE", "DK", "DO", "EC", "EE", "ES", "FI", "FR", "GB", "GR", "GT", "HK", "HN",
+           "HU", "ID", "IE", "IL", "IS", "IT", "JP", "LI", "LT", "LU", "LV", "MC", "MT", "MX",
+           "MY", "NI", "NL", "NO", "NZ", "PA", "PE", "PH", "PL", "PT", "PY", "RO", "SE", "SG",
+           "SK", "SV", "TH", "TR", "TW", "US", "UY", "VN", "ZA"]
+
+
+def _images(prefix):
+    return [
+        {"height": size, "width": size, "url": f"https://i.scdn.co/image/{prefix}{size}"}
+        for size in (640, 300, 64)
+    ]
+
+
+def _artist_ref(i):
+    return {
+        "id": f"artist{i % 5000:022d}",
+        "name": f"Artist {i % 5000}",
+        "type": "artist",
+        "uri": f"spotify:artist:artist{i % 5000:022d}",
+        "href": f"https://api.spotify.com/v1/artists/artist{i % 5000:022d}",
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/artist{i % 5000:022d}"},
+    }
+
+
+def spotify_track(i):
+    return {
+        "id": f"track{i:022d}",
+        "name": f"Track number {i}",
+        "type": "track",
+        "uri": f"spotify:track:track{i:022d}",
+        "href": f"https://api.spotify.com/v1/tracks/track{i:022d}",
+        "duration_ms": 180000 + i % 60000,
+        "explicit": False,
+        "popularity": i % 100,
+        "track_number": i % 12 + 1,
+        "disc_number": 1,
+        "is_local": False,
+        "preview_url": f"https://p.scdn.co/mp3-preview/{i:040d}",
+        "available_markets": MARKETS,
+        "external_ids": {"isrc": f"ES{i:010d}"},
+        "external_urls": {"spotify": f"https://open.spotify.com/track/track{i:022d}"},
+        "artists": [_artist_ref(i), _artist_ref(i + 1)],
+        "album": {
+            "id": f"album{i // 10:022d}",
+            "name": f"Album {i // 10}",
+            "album_type": "album",
+            "release_date": "2020-01-01",
+            "release_date_precision": "day",
+            "total_tracks": 12,
+            "available_markets": MARKETS,
+            "images": _images(f"album{i // 10}"),
+            "artists": [_artist_ref(i)],
+            "external_urls": {"spotify": f"https://open.spotify.com/album/album{i // 10:022d}"},
+        },
+    }
+
+
+def spotify_artist(i):
+    return {
+        "id": f"artist{i:022d}",
+        "name": f"Artist {i}",
+        "type": "artist",
+        "uri": f"spotify:artist:artist{i:022d}",
+        "href": f"https://api.spotify.com/v1/artists/artist{i:022d}",
+        "popularity": i % 100,
+        "genres": ["indie pop", "spanish rock", "latin alternative"][: i % 3 + 1],
+        "followers": {"href": None, "total": i * 37},
+        "images": _images(f"artist{i}"),
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/artist{i:022d}"},
+    }
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096
+
+
+def _fill(payloads, convert):
+    return {i: convert(json.loads(raw)) for i, raw in enumerate(payloads)}
+
+
+def measure(payloads, convert):
+    """Bytes por entidad: (tracemalloc, RSS). El RSS se mide sin tracemalloc activo."""
+    gc.collect()
+    tracemalloc.start()
+    cache = _fill(payloads, convert)
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cache
+    gc.collect()
+
+    rss_before = rss_bytes()
+    cache = _fill(payloads, convert)
+    gc.collect()
+    rss = rss_bytes() - rss_before
+    del cache
+    gc.collect()
+    return traced / len(payloads), rss / len(payloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=20000)
+    args = parser.parse_args()
+
+    for kind, build in (("track", spotify_track), ("artist", spotify_artist)):
+        payloads = [json.dumps(build(i)).encode("utf-8") for i in range(args.entities)]
+        raw_traced, raw_rss = measure(payloads, lambda data: data)
+        compact_traced, compact_rss = measure(payloads, lambda data: from_spotify(kind, data))
+        print(f"{kind} ({args.entities} entidades)")
+        print(f"  {'dict JSON de Spotify':<24} {raw_traced:9.0f} B/entidad (tracemalloc)  {raw_rss:9.0f} B/entidad (RSS)")
+        print(f"  {'entidad compacta':<24} {compact_traced:9.0f} B/entidad (tracemalloc)  {compact_rss:9.0f} B/entidad (RSS)")
+        print(f"  reduccion x{raw_traced / compact_traced:.1f}")
+
+
+if __name__ == "__main__":
+    main()
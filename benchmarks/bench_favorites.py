@@ -0,0 +1,91 @@
+"""
+Llamadas upstream y tiempo de /v1/users/<id>/favorites/details:
+una peticion por id (antes) vs endpoints multi-id de Spotify (despues).
+
+Uso: python -m benchmarks.bench_favorites --favorites 200 --latency-ms 5
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app import create_app
+from app.services.metadata_cache import metadata_cache_from_config
+from app.services.spotify_service import SpotifyService
+from benchmarks.fake_spotify import start_server
+
+USER_ID = "bench-user"
+
+
+def write_users(path, n):
+    user = {
+        "id": USER_ID,
+        "name": "Bench",
+        "email": "bench@example.com",
+        "favorite_tracks": [f"t{i}" for i in range(n)],
+        "favorite_artists": [f"a{i}" for i in range(n)],
+    }
+    Path(path).write_text(json.dumps([user]), encoding="utf-8")
+    return user
+
+
+def upstream_calls(server):
+    with server.lock:
+        calls = dict(server.calls)
+        server.calls.clear()
+    calls.pop("token", None)
+    return sum(calls.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--favorites", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server, url = start_server(latency_ms=args.latency_ms)
+    tmp = tempfile.TemporaryDirectory()
+    app = create_app()
+    app.config["SPOTIFY_API_BASE_URL"] = f"{url}/v1"
+    app.config["SPOTIFY_TOKEN_URL"] = f"{url}/api/token"
+    # Sin limite de ritmo: se mide el numero de llamadas, no el planificador
+    app.config["SPOTIFY_RATE_LIMIT_PER_SECOND"] = 1e6
+    app.config["SPOTIFY_RATE_LIMIT_BURST"] = 10000
+    app.config["USERS_DATA_PATH"] = str(Path(tmp.name) / "users.json")
+    user = write_users(app.config["USERS_DATA_PATH"], args.favorites)
+    cache = metadata_cache_from_config(app.config)
+
+    try:
+        with app.app_context():
+            service = SpotifyService()
+            service._get_access_token()
+            upstream_calls(server)
+
+            cache.clear()
+            started = time.perf_counter()
+            for track_id in user["favorite_tracks"]:
+                service.get_track(track_id)
+            for artist_id in user["favorite_artists"]:
+                service.get_artist(artist_id)
+            before_time = time.perf_counter() - started
+            before_calls = upstream_calls(server)
+
+        cache.clear()
+        client = app.test_client()
+        started = time.perf_counter()
+        resp = client.get(f"/v1/users/{USER_ID}/favorites/details")
+        after_time = time.perf_counter() - started
+        after_calls = upstream_calls(server)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+
+        print(f"favoritos: {args.favorites} tracks + {args.favorites} artistas")
+        print(f"antes   (1 llamada por id): {before_calls:4d} llamadas  {before_time * 1000:8.1f} ms")
+        print(f"despues (multi-id, 50/lote): {after_calls:4d} llamadas  {after_time * 1000:8.1f} ms")
+    finally:
+        server.shutdown()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
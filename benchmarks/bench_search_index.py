@@ -0,0 +1,118 @@
+"""
+Indice local de busqueda (app.services.search_index) con N entidades:
+tiempo de indexado, memoria (RSS) y latencia de consulta por tipo de query.
+
+Los nombres se generan con un vocabulario con distribucion de Zipf (pocas
+palabras muy frecuentes, muchas raras), como en un catalogo real. Con
+--max-entities menor que --entities se comprueba ademas la cota de memoria
+(expulsion FIFO).
+
+Uso: python -m benchmarks.bench_search_index --entities 1000000 --queries 500
+"""
+import argparse
+import gc
+import math
+import random
+import statistics
+import time
+
+from app.models import Track
+from app.services.search_index import LocalSearchIndex
+from benchmarks.bench_entity_memory import rss_bytes
+
+ONSETS = ["", "b", "c", "d", "f", "g", "k", "l", "m", "n", "p", "r", "s", "t", "v", "z",
+          "br", "ch", "cr", "dr", "fl", "gr", "pl", "st", "tr", "th", "sh"]
+VOWELS = ["a", "e", "i", "o", "u", "ai", "ea", "ou", "y"]
+CODAS = ["", "", "", "n", "r", "s", "l", "t", "ck", "nd", "st"]
+
+
+def vocabulary(size, rnd):
+    words = set()
+    while len(words) < size:
+        words.add("".join(
+            rnd.choice(ONSETS) + rnd.choice(VOWELS) + rnd.choice(CODAS) for _ in range(rnd.randint(1, 3))
+        ))
+    return sorted(words, key=lambda word: rnd.random())
+
+
+def zipf_word(words, rnd):
+    return words[min(int(len(words) * rnd.random() ** 4), len(words) - 1)]
+
+
+def make_tracks(n, rnd):
+    words = vocabulary(50000, rnd)
+    artists = [" ".join(zipf_word(words, rnd) for _ in range(2)).title() for _ in range(max(n // 20, 1))]
+    tracks = []
+    for i in range(n):
+        name = " ".join(zipf_word(words, rnd) for _ in range(rnd.randint(1, 4))).title()
+        tracks.append(Track(
+            id=f"track{i:016d}",
+            name=name,
+            artists=(artists[min(int(len(artists) * rnd.random() ** 2), len(artists) - 1)],),
+            album="",
+            duration_ms=None,
+            preview_url=None,
+            external_url=None,
+        ))
+    return tracks
+
+
+def queries(tracks, count, rnd):
+    sample = rnd.sample(tracks, count)
+    return {
+        "palabra del nombre": [rnd.choice(t.name.split()) for t in sample],
+        "nombre completo": [t.name for t in sample],
+        "nombre + artista": [f"{t.name} {t.artists[0]}" for t in sample],
+        "prefijo (3 letras)": [t.name[:3] for t in sample],
+        "errata (1 letra)": [t.name[:-1] + "x" for t in sample],
+    }
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(len(ordered) * p) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=1000000)
+    parser.add_argument("--max-entities", type=int, default=None)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    tracks = make_tracks(args.entities, rnd)
+    gc.collect()
+
+    index = LocalSearchIndex(max_entities=args.max_entities or args.entities)
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    for offset in range(0, len(tracks), 1000):
+        index.add_many("track", tracks[offset:offset + 1000])
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    rss = rss_bytes() - rss_before
+    stats = index.stats()
+    print(
+        f"{args.entities} tracks indexados en {elapsed:.1f} s ({args.entities / elapsed:,.0f}/s); "
+        f"{stats['entities']} en el indice, {stats['trigrams']} trigramas, {stats['postings']:,} apariciones"
+    )
+    print(f"memoria del indice (RSS): {rss / 2**20:.0f} MiB ({rss / max(stats['entities'], 1):.0f} B/entidad)")
+
+    print(f"{'consulta':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'con resultados':>15}")
+    for name, texts in queries(tracks, args.queries, rnd).items():
+        samples, found = [], 0
+        for text in texts:
+            t0 = time.perf_counter()
+            result = index.search("track", text, args.limit)
+            samples.append((time.perf_counter() - t0) * 1000)
+            found += bool(result)
+        print(
+            f"{name:<22} {statistics.median(samples):8.2f} {percentile(samples, 0.95):8.2f} "
+            f"{percentile(samples, 0.99):8.2f} {found / len(texts):14.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
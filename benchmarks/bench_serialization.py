@@ -0,0 +1,111 @@
+"""
+Coste de serializar las respuestas de lectura: marshmallow + json de Flask
+(camino por defecto) frente al camino rapido (dict de confianza codificado
+con orjson o, si no esta instalado, con json).
+
+Uso: python -m benchmarks.bench_serialization --users 10000 --favorites 200
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app import create_app
+from app.schemas.spotify_schemas import FavoritesDetailSchema
+from app.schemas.user_schemas import UserSchema
+from app.serialization import dumps, orjson
+from benchmarks.bench_user_backends import make_users
+
+
+def make_favorites(n):
+    tracks = [
+        {
+            "id": f"t{i}",
+            "name": f"Track {i}",
+            "artists": [f"Artist {i}", f"Artist {i + 1}"],
+            "album": f"Album {i}",
+            "preview_url": None,
+            "external_url": f"https://open.spotify.com/track/t{i}",
+        }
+        for i in range(n)
+    ]
+    artists = [
+        {
+            "id": f"a{i}",
+            "name": f"Artist {i}",
+            "genres": ["rock", "indie"],
+            "followers": i * 100,
+            "external_url": f"https://open.spotify.com/artist/a{i}",
+        }
+        for i in range(n)
+    ]
+    return {"tracks": tracks, "artists": artists, "errors": []}
+
+
+def timed(func, repeat):
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def encoders(app, schema, payload):
+    def marshmallow():
+        return app.json.dumps(schema.dump(payload))
+
+    def stdlib():
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    rows = [("marshmallow + flask json", marshmallow), ("rapido (json)", stdlib)]
+    if orjson is not None:
+        rows.append(("rapido (orjson)", lambda: dumps(payload)))
+    return rows
+
+
+def end_to_end(app, path, repeat):
+    results = {}
+    for fast in (False, True):
+        app.config["FAST_SERIALIZATION"] = fast
+        client = app.test_client()
+        results[fast] = timed(lambda: client.get(path), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--favorites", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    users = make_users(args.users)
+    favorites = make_favorites(args.favorites)
+
+    with app.app_context():
+        cases = [
+            (f"GET /v1/users ({args.users} usuarios)", UserSchema(many=True), users),
+            (f"favorites/details ({args.favorites}+{args.favorites})", FavoritesDetailSchema(), favorites),
+        ]
+        for title, schema, payload in cases:
+            print(title)
+            base = None
+            for name, func in encoders(app, schema, payload):
+                ms = timed(func, args.repeat)
+                base = base or ms
+                print(f"  {name:<28} {ms:9.2f} ms  x{base / ms:5.1f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "users.json"
+        path.write_text(json.dumps(users), encoding="utf-8")
+        app.config["USERS_DATA_PATH"] = str(path)
+        results = end_to_end(app, "/v1/users", args.repeat)
+        print(f"GET /v1/users extremo a extremo (test_client, {args.users} usuarios)")
+        print(f"  {'FAST_SERIALIZATION=0':<28} {results[False]:9.2f} ms")
+        print(f"  {'FAST_SERIALIZATION=1':<28} {results[True]:9.2f} ms  x{results[False] / results[True]:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Consultas de audiencia sobre favoritos con N usuarios: recorrer todos los
+usuarios (antes) frente al indice invertido de app.repositories.favorites_index,
+con NumPy si esta instalado y con el camino en Python puro.
+
+Los favoritos siguen una distribucion sesgada (unos pocos tracks y artistas
+muy populares), como en la realidad.
+
+Uso: python -m benchmarks.bench_similar_users --users 100000 --queries 200
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+
+from app.repositories import favorites_index
+from app.repositories.favorites_index import FavoritesIndex
+
+
+def make_users(n, tracks, artists, seed=1):
+    rnd = random.Random(seed)
+    users = []
+    for i in range(n):
+        users.append({
+            "id": f"user-{i:08d}",
+            "favorite_tracks": [f"t{int(tracks * rnd.random() ** 3)}" for _ in range(rnd.randint(5, 40))],
+            "favorite_artists": [f"a{int(artists * rnd.random() ** 3)}" for _ in range(rnd.randint(2, 15))],
+        })
+    return users
+
+
+def scan_users_with(users, track_id):
+    return [u["id"] for u in users if track_id in u["favorite_tracks"]]
+
+
+def scan_similar(users, user, k):
+    mine = set(user["favorite_tracks"]) | {"a:" + a for a in user["favorite_artists"]}
+    scored = []
+    for other in users:
+        if other is user:
+            continue
+        theirs = set(other["favorite_tracks"]) | {"a:" + a for a in other["favorite_artists"]}
+        shared = len(mine & theirs)
+        if shared:
+            scored.append((shared / len(mine | theirs), other["id"]))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), sorted(samples)[math.ceil(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--tracks", type=int, default=200000)
+    parser.add_argument("--artists", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=5)
+    args = parser.parse_args()
+
+    users = make_users(args.users, args.tracks, args.artists)
+    rnd = random.Random(2)
+    sample = rnd.sample(users, args.queries)
+    track_ids = [(rnd.choice(u["favorite_tracks"]),) for u in sample]
+
+    start = time.perf_counter()
+    index = FavoritesIndex()
+    index.rebuild(users, "bench")
+    print(f"{args.users} usuarios; construir el indice: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rows = []
+    scan = sample[:args.scan_queries]
+    rows.append(("scan: quien tiene X", timed(lambda t: scan_users_with(users, t), track_ids[:len(scan)])))
+    rows.append(("scan: similares top-10", timed(lambda u: scan_similar(users, u, 10), [(u,) for u in scan])))
+    rows.append(("indice: quien tiene X", timed(lambda t: index.users_with("tracks", t, 100), track_ids)))
+
+    numpy = favorites_index.np
+    if numpy is not None:
+        rows.append(("indice+numpy: similares", timed(lambda u: index.similar(u["id"], 10), [(u,) for u in sample])))
+    favorites_index.np = None
+    try:
+        rows.append(("indice+python: similares", timed(lambda u: index.similar(u["id"], 10), [(u,) for u in sample])))
+    finally:
+        favorites_index.np = numpy
+    if numpy is None:
+        print("(numpy no instalado: solo el camino en Python puro)")
+
+    print(f"{'consulta':<28} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, (p50, p95) in rows:
+        print(f"{name:<28} {p50:10.2f} {p95:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Latencia p50/p99 de GETs a Spotify: requests.get por llamada vs sesion compartida.
+
+Uso: python -m benchmarks.bench_transport --requests 500 --latency-ms 2
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from app.services.http_transport import build_session
+from benchmarks.fake_spotify import start_server
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(get, url, n):
+    samples = []
+    for i in range(n):
+        started = time.perf_counter()
+        resp = get(f"{url}/v1/tracks/t{i}", timeout=(3.05, 10))
+        resp.raise_for_status()
+        resp.json()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(label, samples):
+    print(
+        f"{label:<28} p50={percentile(samples, 50):7.3f} ms  "
+        f"p99={percentile(samples, 99):7.3f} ms  mean={statistics.mean(samples):7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = start_server(latency_ms=args.latency_ms)
+    try:
+        # Calentar el servidor antes de medir
+        run(requests.get, url, 10)
+        report("antes (requests.get)", run(requests.get, url, args.requests))
+        session = build_session()
+        report("despues (sesion compartida)", run(session.get, url, args.requests))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compara los motores de usuarios (json, journal, sqlite) con N usuarios:
+carga en frio (en sqlite incluye la migracion desde JSON), lecturas por
+id, altas y listado completo.
+
+Uso: python -m benchmarks.bench_user_backends --sizes 1000,100000,1000000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.repositories.journal_store import JournalUserStore
+from app.repositories.json_store import JsonUserStore
+from app.repositories.sqlite_store import SqliteUserStore, migrate_from_json
+
+
+def make_users(n):
+    return [
+        {
+            "id": f"user-{i}",
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "favorite_tracks": [f"t{(i * 7 + k) % 5000}" for k in range(5)],
+            "favorite_artists": [f"a{(i * 3 + k) % 2000}" for k in range(3)],
+        }
+        for i in range(n)
+    ]
+
+
+def open_store(backend, directory, json_path):
+    if backend == "json":
+        return JsonUserStore(json_path, [])
+    if backend == "journal":
+        return JournalUserStore(json_path, [], compact_every=0)
+    db_path = Path(directory) / "users.db"
+    migrate_from_json(json_path, db_path)
+    return SqliteUserStore(db_path, [])
+
+
+def timed(func, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def bench(backend, n, reads, writes):
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = Path(directory) / "users.json"
+        json_path.write_text(json.dumps(make_users(n)), encoding="utf-8")
+
+        started = time.perf_counter()
+        store = open_store(backend, directory, json_path)
+        store.get_by_id("user-0")
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        ids = [f"user-{random.randrange(n)}" for _ in range(reads)]
+        read_ms = timed(lambda: [store.get_by_id(i) for i in ids]) / reads
+
+        counter = iter(range(writes))
+
+        def create():
+            i = next(counter)
+            store.insert({
+                "id": f"new-{i}", "name": "New", "email": f"new{i}@example.com",
+                "favorite_tracks": ["t1"], "favorite_artists": ["a1"],
+            })
+
+        write_ms = timed(create, repeat=writes)
+        list_ms = timed(store.all_users)
+
+    print(
+        f"{backend:<8} n={n:<8} carga={cold_ms:9.1f} ms  get_by_id={read_ms * 1000:8.1f} us  "
+        f"alta={write_ms:8.2f} ms  listado={list_ms:9.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--backends", default="json,journal,sqlite")
+    parser.add_argument("--reads", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=20)
+    args = parser.parse_args()
+
+    for n in (int(size) for size in args.sizes.split(",")):
+        for backend in args.backends.split(","):
+            bench(backend, n, args.reads, args.writes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Servidor local que imita los endpoints de Spotify usados por la API:
+token, search, tracks/albums/artists (por id y multi-id con ?ids=).
+
+Permite inyectar latencia (con jitter), errores 500 y respuestas 429.
+
+Uso:
+    python -m benchmarks.fake_spotify --port 8901 --latency-ms 20 --error-rate 0.01
+    SPOTIFY_API_BASE_URL=http://127.0.0.1:8901/v1 \
+    SPOTIFY_TOKEN_URL=http://127.0.0.1:8901/api/token python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_track(track_id):
+    return {
+        "id": track_id,
+        "name": f"Track {track_id}",
+        "artists": [{"id": f"ar-{track_id}", "name": f"Artist {track_id}"}],
+        "album": {"id": f"al-{track_id}", "name": f"Album {track_id}"},
+        "duration_ms": 180000,
+        "preview_url": None,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+    }
+
+
+def fake_album(album_id):
+    return {
+        "id": album_id,
+        "name": f"Album {album_id}",
+        "artists": [{"id": f"ar-{album_id}", "name": f"Artist {album_id}"}],
+        "release_date": "2020-01-01",
+        "total_tracks": 10,
+        "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+    }
+
+
+def fake_artist(artist_id):
+    return {
+        "id": artist_id,
+        "name": f"Artist {artist_id}",
+        "genres": ["pop", "rock"],
+        "followers": {"total": 1000},
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+    }
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, path):
+        server = self.server
+        with server.lock:
+            server.calls[path] = server.calls.get(path, 0) + 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self._count("token")
+        self._sleep()
+        if urlparse(self.path).path.endswith("/api/token"):
+            self._send_json(200, {"access_token": "fake-token", "expires_in": 3600})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _sleep(self):
+        server = self.server
+        delay = server.latency
+        if server.jitter:
+            delay += random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+    def _inject_failure(self):
+        """Responde 429 o 500 con las probabilidades configuradas."""
+        server = self.server
+        roll = random.random()
+        if roll < server.throttle_rate:
+            self._count("429")
+            body = b'{"error": {"status": 429, "message": "API rate limit exceeded"}}'
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return True
+        if roll < server.throttle_rate + server.error_rate:
+            self._count("500")
+            self._send_json(500, {"error": {"status": 500, "message": "Server error"}})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+        self._sleep()
+        if self._inject_failure():
+            return
+
+        if parts[:1] == ["v1"]:
+            parts = parts[1:]
+
+        if parts == ["search"]:
+            self._count("search")
+            type_ = query.get("type", ["track"])[0]
+            limit = int(query.get("limit", ["10"])[0])
+            q = query.get("q", [""])[0]
+            builder = {"track": fake_track, "album": fake_album, "artist": fake_artist}[type_]
+            items = [builder(f"{q}-{i}") for i in range(limit)]
+            self._send_json(200, {f"{type_}s": {"items": items}})
+            return
+
+        builders = {"tracks": fake_track, "albums": fake_album, "artists": fake_artist}
+        if len(parts) == 1 and parts[0] in builders and "ids" in query:
+            self._count(f"{parts[0]}?ids")
+            ids = query["ids"][0].split(",")
+            self._send_json(200, {parts[0]: [builders[parts[0]](i) for i in ids]})
+            return
+        if len(parts) == 2 and parts[0] in builders:
+            self._count(parts[0])
+            self._send_json(200, builders[parts[0]](parts[1]))
+            return
+
+        self._send_json(404, {"error": "not found"})
+
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # La cola por defecto (5) provoca reintentos de SYN de 1 s bajo carga
+    request_queue_size = 128
+
+
+def start_server(port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1):
+    """Arranca el servidor en un hilo y devuelve (server, base_url)."""
+    server = FakeSpotifyServer(("127.0.0.1", port), FakeSpotifyHandler)
+    server.latency = latency_ms / 1000.0
+    server.jitter = jitter_ms / 1000.0
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.retry_after = retry_after
+    server.calls = {}
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraccion de GETs que responden 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraccion de GETs que responden 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Segundos en la cabecera Retry-After")
+    args = parser.parse_args()
+    server, base_url = start_server(
+        args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+    )
+    print(f"Fake Spotify escuchando en {base_url} (API: {base_url}/v1, token: {base_url}/api/token)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Prueba de carga reproducible de todas las rutas de create_app() contra el
+servidor local que imita Spotify. Informa de throughput y latencias
+p50/p95/p99 por ruta.
+
+Uso: python -m benchmarks.load_test --duration 10 --concurrency 8 --latency-ms 20
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app
+from benchmarks.bench_transport import percentile
+from benchmarks.fake_spotify import start_server
+
+# (nombre, peso) de cada tipo de peticion
+ROUTES = [
+    ("GET /", 1),
+    ("GET /health", 2),
+    ("GET /v1/search", 10),
+    ("GET /v1/tracks/<id>", 10),
+    ("GET /v1/albums/<id>", 5),
+    ("GET /v1/artists/<id>", 5),
+    ("GET /v1/users", 3),
+    ("GET /v1/users/<id>", 10),
+    ("GET /v1/users/<id>/favorites/details", 8),
+    ("POST /v1/users", 2),
+    ("PATCH /v1/users/<id>", 2),
+    ("DELETE /v1/users/<id>", 1),
+]
+
+
+def seed_users(path, n, catalog):
+    rng = random.Random(0)
+    users = [
+        {
+            "id": f"load-user-{i}",
+            "name": f"Load {i}",
+            "email": f"load{i}@example.com",
+            "favorite_tracks": [f"t{rng.randrange(catalog)}" for _ in range(10)],
+            "favorite_artists": [f"a{rng.randrange(catalog)}" for _ in range(5)],
+        }
+        for i in range(n)
+    ]
+    Path(path).write_text(json.dumps(users), encoding="utf-8")
+    return [u["id"] for u in users]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Worker(threading.Thread):
+    def __init__(self, index, base_url, user_ids, catalog, stop_at, seed):
+        super().__init__(daemon=True)
+        self.rng = random.Random(seed * 1000 + index)
+        self.base_url = base_url
+        self.user_ids = user_ids
+        self.catalog = catalog
+        self.stop_at = stop_at
+        self.index = index
+        self.session = requests.Session()
+        self.created = []
+        self.samples = {name: [] for name, _ in ROUTES}
+        self.errors = {name: 0 for name, _ in ROUTES}
+
+    def _request(self, name):
+        rng = self.rng
+        item = rng.randrange(self.catalog)
+        user_id = rng.choice(self.user_ids)
+        method, path = name.split(" ", 1)
+        body = None
+
+        if name == "GET /v1/search":
+            path = f"/v1/search?q=query{rng.randrange(200)}&type={rng.choice(['track', 'album', 'artist'])}"
+        elif name.startswith("GET /v1/tracks"):
+            path = f"/v1/tracks/t{item}"
+        elif name.startswith("GET /v1/albums"):
+            path = f"/v1/albums/al{item}"
+        elif name.startswith("GET /v1/artists"):
+            path = f"/v1/artists/a{item}"
+        elif name == "GET /v1/users":
+            path = "/v1/users?limit=50"
+        elif name == "POST /v1/users":
+            path = "/v1/users"
+            suffix = f"{self.index}-{len(self.created)}-{rng.randrange(10**9)}"
+            body = {"name": "Load", "email": f"new{suffix}@example.com", "favorite_tracks": [f"t{item}"]}
+        elif name in ("PATCH /v1/users/<id>", "DELETE /v1/users/<id>"):
+            if not self.created:
+                return None
+            target = self.created[-1] if method == "PATCH" else self.created.pop()
+            path = f"/v1/users/{target}"
+            body = {"name": "Updated"} if method == "PATCH" else None
+        else:
+            path = path.replace("<id>", user_id)
+
+        started = time.perf_counter()
+        resp = self.session.request(method, self.base_url + path, json=body, timeout=30)
+        elapsed = (time.perf_counter() - started) * 1000
+        if name == "POST /v1/users" and resp.status_code == 201:
+            self.created.append(resp.json()["id"])
+        return elapsed, resp.status_code
+
+    def run(self):
+        names = [name for name, _ in ROUTES]
+        weights = [weight for _, weight in ROUTES]
+        while time.monotonic() < self.stop_at:
+            name = self.rng.choices(names, weights)[0]
+            try:
+                outcome = self._request(name)
+            except requests.RequestException:
+                self.errors[name] += 1
+                continue
+            if outcome is None:
+                continue
+            elapsed, status = outcome
+            self.samples[name].append(elapsed)
+            if status >= 500:
+                self.errors[name] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--catalog", type=int, default=500, help="ids distintos de track/album/artist")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--users-backend", default="json")
+    parser.add_argument(
+        "--upstream-rate", type=float, default=None,
+        help="SPOTIFY_RATE_LIMIT_PER_SECOND (por defecto, el de la configuracion)",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    fake, fake_url = start_server(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+    )
+    tmp = tempfile.TemporaryDirectory()
+    users_path = Path(tmp.name) / "users.json"
+    user_ids = seed_users(users_path, args.users, args.catalog)
+
+    app = create_app()
+    app.config.update(
+        SPOTIFY_API_BASE_URL=f"{fake_url}/v1",
+        SPOTIFY_TOKEN_URL=f"{fake_url}/api/token",
+        USERS_DATA_PATH=str(users_path),
+        USERS_BACKEND=args.users_backend,
+    )
+    if args.upstream_rate:
+        app.config["SPOTIFY_RATE_LIMIT_PER_SECOND"] = args.upstream_rate
+        app.config["SPOTIFY_RATE_LIMIT_BURST"] = int(args.upstream_rate * 2)
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    started = time.monotonic()
+    stop_at = started + args.duration
+    workers = [
+        Worker(i, base_url, user_ids, args.catalog, stop_at, args.seed)
+        for i in range(args.concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - started
+
+    server.shutdown()
+    fake.shutdown()
+    tmp.cleanup()
+
+    print(f"duracion={elapsed:.1f}s concurrencia={args.concurrency} latencia_upstream={args.latency_ms}ms")
+    print(f"{'ruta':<40} {'n':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    all_samples = []
+    for name, _ in ROUTES:
+        samples = [s for w in workers for s in w.samples[name]]
+        errors = sum(w.errors[name] for w in workers)
+        all_samples.extend(samples)
+        if not samples:
+            continue
+        print(
+            f"{name:<40} {len(samples):>7} {errors:>5} {len(samples) / elapsed:>8.1f} "
+            f"{percentile(samples, 50):>8.2f} {percentile(samples, 95):>8.2f} {percentile(samples, 99):>8.2f}"
+        )
+    if all_samples:
+        print(
+            f"{'TOTAL':<40} {len(all_samples):>7} {'':>5} {len(all_samples) / elapsed:>8.1f} "
+            f"{percentile(all_samples, 50):>8.2f} {percentile(all_samples, 95):>8.2f} "
+            f"{percentile(all_samples, 99):>8.2f}"
+        )
+    print(f"llamadas al fake: {fake.calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Prueba de estres del motor JSON con varios procesos sobre el mismo archivo
+(como varios workers de gunicorn con el mismo USERS_DATA_PATH).
+
+Cada proceso abre su propio JsonUserStore y hace una mezcla de lecturas,
+altas, cambios y bajas sobre sus propios usuarios. Al terminar se comprueba
+que el archivo contiene exactamente lo que cada proceso dejo (ninguna alta,
+cambio o baja perdida) y que nadie leyo nunca un archivo a medio escribir.
+
+Uso: python -m benchmarks.stress_json_repository --processes 8 --ops 300 --users 1000
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.repositories.json_store import JsonUserStore
+from benchmarks.bench_user_backends import make_users
+
+# Proporcion de cada operacion en la mezcla
+MIX = (("read", 0.55), ("insert", 0.2), ("update", 0.15), ("delete", 0.1))
+
+
+def pick_operation(rng):
+    value = rng.random()
+    for name, weight in MIX:
+        if value < weight:
+            return name
+        value -= weight
+    return MIX[-1][0]
+
+
+def worker(path, worker_id, ops, seed_ids, barrier, results):
+    rng = random.Random(worker_id)
+    store = JsonUserStore(Path(path), [])
+    expected = {}       # id -> nombre esperado de los usuarios propios vivos
+    deleted = set()
+    counts = {name: 0 for name, _ in MIX}
+    torn_reads = 0
+    barrier.wait()
+
+    started = time.perf_counter()
+    for i in range(ops):
+        operation = pick_operation(rng)
+        if operation in ("update", "delete") and not expected:
+            operation = "insert"
+        if operation == "read":
+            # Un archivo a medio escribir haria que el store sembrase datos vacios
+            if store.get_by_id(rng.choice(seed_ids)) is None:
+                torn_reads += 1
+        elif operation == "insert":
+            user_id = f"w{worker_id}-{i}"
+            store.insert({
+                "id": user_id, "name": "v0", "email": f"{user_id}@example.com",
+                "favorite_tracks": [f"t{i}"], "favorite_artists": [],
+            })
+            expected[user_id] = "v0"
+        elif operation == "update":
+            user_id = rng.choice(list(expected))
+            name = f"v{i}"
+            store.update(user_id, {"name": name})
+            expected[user_id] = name
+        else:
+            user_id = rng.choice(list(expected))
+            store.delete(user_id)
+            del expected[user_id]
+            deleted.add(user_id)
+        counts[operation] += 1
+    elapsed = time.perf_counter() - started
+    results.put((worker_id, expected, deleted, counts, torn_reads, elapsed))
+
+
+def check(path, seed_ids, outcomes):
+    """Errores de consistencia entre el archivo final y lo que hizo cada proceso."""
+    with open(path, encoding="utf-8") as f:
+        users = {user["id"]: user for user in json.load(f)}
+    errors = []
+    missing_seed = [user_id for user_id in seed_ids if user_id not in users]
+    if missing_seed:
+        errors.append(f"{len(missing_seed)} usuarios iniciales perdidos")
+    lost = wrong = resurrected = 0
+    for _, expected, deleted, _, _, _ in outcomes:
+        for user_id, name in expected.items():
+            if user_id not in users:
+                lost += 1
+            elif users[user_id]["name"] != name:
+                wrong += 1
+        resurrected += sum(1 for user_id in deleted if user_id in users)
+    extra = len(users) - len(seed_ids) - sum(len(outcome[1]) for outcome in outcomes)
+    if lost:
+        errors.append(f"{lost} altas perdidas")
+    if wrong:
+        errors.append(f"{wrong} cambios perdidos")
+    if resurrected:
+        errors.append(f"{resurrected} bajas perdidas")
+    if extra:
+        errors.append(f"{extra} usuarios de mas")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300, help="operaciones por proceso")
+    parser.add_argument("--users", type=int, default=1000, help="usuarios iniciales")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "users.json"
+        seed = make_users(args.users)
+        path.write_text(json.dumps(seed), encoding="utf-8")
+        seed_ids = [user["id"] for user in seed]
+
+        barrier = multiprocessing.Barrier(args.processes)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(str(path), n, args.ops, seed_ids, barrier, results))
+            for n in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        errors = check(path, seed_ids, outcomes)
+
+    totals = {name: sum(outcome[3][name] for outcome in outcomes) for name, _ in MIX}
+    torn_reads = sum(outcome[4] for outcome in outcomes)
+    wall = max(outcome[5] for outcome in outcomes)
+    writes = totals["insert"] + totals["update"] + totals["delete"]
+    print(
+        f"procesos={args.processes} usuarios={args.users} ops={sum(totals.values())} "
+        f"({', '.join(f'{name}={count}' for name, count in totals.items())})"
+    )
+    print(
+        f"tiempo={wall:.2f} s  total={sum(totals.values()) / wall:,.0f} ops/s  "
+        f"escrituras={writes / wall:,.0f} ops/s  lecturas rotas={torn_reads}"
+    )
+    if errors or torn_reads:
+        print("FALLO: " + "; ".join(errors + ([f"{torn_reads} lecturas rotas"] if torn_reads else [])))
+        raise SystemExit(1)
+    print("OK: el archivo final coincide con las operaciones de todos los procesos")
+
+
+if __name__ == "__main__":
+    main()